@@ -30,6 +30,7 @@ setup(
         'console_scripts': [
             'pattern-make = os_urlpattern.cmdline:make',
             'pattern-match = os_urlpattern.cmdline:match',
+            'pattern-merge = os_urlpattern.cmdline:merge',
         ]
     },
     extras_require={
@@ -0,0 +1,296 @@
+"""Benchmark suite.
+
+Time the parse, load, cluster, format and match stages on fixed-seed
+synthetic corpora, report throughput, latency percentiles and peak
+memory as json::
+
+    $ python -m os_urlpattern.bench -n 100000 -o bench.json
+
+Optionally time the load and cluster stages on a wide piece tree::
+
+    $ python -m os_urlpattern.bench -n 10000 -w 100000
+
+"""
+from __future__ import print_function, unicode_literals
+
+import argparse
+import gc
+import json
+import platform
+import random
+import sys
+from timeit import default_timer
+
+from . import __version__
+from .formatter import FORMATTERS, pformat
+from .generator import URLGenerator
+from .parse_utils import PieceParser, analyze_url
+from .pattern_maker import PatternMaker
+from .pattern_matcher import PatternMatcher
+
+try:
+    import tracemalloc
+except ImportError:
+    tracemalloc = None
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+
+def make_corpus(num, seed=0, skew=1.0):
+    """Make a synthetic URL corpus.
+
+    Args:
+        num (int): Number of URLs.
+        seed (int, optional): Defaults to 0. The random seed.
+        skew (float, optional): Defaults to 1.0. Skew of the
+            template frequencies.
+
+    Returns:
+        list: The URLs.
+    """
+    generator = URLGenerator(seed=seed, skew=skew)
+    return [url for _, url in generator.generate(num)]
+
+
+def make_wide_corpus(num, seed=0):
+    """Make a URL corpus of a wide piece tree.
+
+    The first level has num siblings, most of them have the same
+    children.
+
+    Args:
+        num (int): Number of the first level siblings.
+        seed (int, optional): Defaults to 0. The random seed.
+
+    Returns:
+        list: The URLs.
+    """
+    rand = random.Random(seed)
+    names = ['index', 'list', 'show']
+    urls = []
+    for i in range(num):
+        sibling = '%s%d' % (rand.choice('abc'), i)
+        for name in rand.sample(names, rand.randint(1, len(names))):
+            urls.append('http://www.example.com/%s/%s.html' % (sibling, name))
+    return urls
+
+
+def _percentile(sorted_values, p):
+    if not sorted_values:
+        return 0
+    idx = int(round(p / 100.0 * (len(sorted_values) - 1)))
+    return sorted_values[idx]
+
+
+def _peak_memory():
+    if tracemalloc is not None and tracemalloc.is_tracing():
+        return tracemalloc.get_traced_memory()[1]
+    if resource is not None:
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == 'darwin' else peak * 1024
+    return None
+
+
+class Stage(object):
+    """Collect latencies of a benchmark stage."""
+
+    def __init__(self, name):
+        self.name = name
+        self.latencies = []
+        self.seconds = 0
+        self.peak_memory = None
+
+    def __enter__(self):
+        gc.collect()
+        if tracemalloc is not None and tracemalloc.is_tracing():
+            if hasattr(tracemalloc, 'reset_peak'):
+                tracemalloc.reset_peak()
+            else:
+                tracemalloc.clear_traces()
+        self._start = default_timer()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.seconds = default_timer() - self._start
+        self.peak_memory = _peak_memory()
+
+    def add(self, seconds):
+        self.latencies.append(seconds)
+
+    def report(self):
+        latencies = sorted(self.latencies)
+        num = len(latencies)
+        return {
+            'num': num,
+            'seconds': self.seconds,
+            'throughput': num / self.seconds if self.seconds > 0 else 0,
+            'p50': _percentile(latencies, 50),
+            'p90': _percentile(latencies, 90),
+            'p99': _percentile(latencies, 99),
+            'peak_memory': self.peak_memory,
+        }
+
+
+def bench_parse(urls):
+    parser = PieceParser()
+    with Stage('parse') as stage:
+        for url in urls:
+            _, pieces = analyze_url(url)
+            s = default_timer()
+            for piece in pieces:
+                parser.parse(piece)
+            stage.add(default_timer() - s)
+    return stage
+
+
+def bench_load(urls, name='load'):
+    pattern_maker = PatternMaker()
+    with Stage(name) as stage:
+        for url in urls:
+            s = default_timer()
+            pattern_maker.load(url, meta=url)
+            stage.add(default_timer() - s)
+    return stage, pattern_maker
+
+
+def bench_make(pattern_maker, name='make'):
+    clustered = []
+    with Stage(name) as stage:
+        for maker in pattern_maker.makers:
+            s = default_timer()
+            for root in maker.make():
+                clustered.append((maker.url_meta, root))
+            stage.add(default_timer() - s)
+    return stage, clustered
+
+
+def bench_format(name, clustered):
+    with Stage('format_%s' % name.lower()) as stage:
+        for url_meta, root in clustered:
+            s = default_timer()
+            for _ in pformat(name, url_meta, root):
+                pass
+            stage.add(default_timer() - s)
+    return stage
+
+
+def bench_matcher_load(clustered):
+    pattern_matcher = PatternMatcher()
+    patterns = set()
+    for url_meta, root in clustered:
+        for pattern in pformat('pattern', url_meta, root):
+            patterns.add(pattern)
+    with Stage('matcher_load') as stage:
+        for pattern in sorted(patterns):
+            s = default_timer()
+            pattern_matcher.load(pattern, meta=pattern)
+            stage.add(default_timer() - s)
+    return stage, pattern_matcher
+
+
+def bench_match(pattern_matcher, urls):
+    with Stage('match') as stage:
+        for url in urls:
+            s = default_timer()
+            pattern_matcher.match(url)
+            stage.add(default_timer() - s)
+    return stage
+
+
+def run(num=10000, seed=0, skew=1.0, trace_memory=False, wide=0):
+    """Run all of the benchmark stages.
+
+    Args:
+        num (int, optional): Defaults to 10000. Number of URLs.
+        seed (int, optional): Defaults to 0. The random seed.
+        skew (float, optional): Defaults to 1.0. Skew of the
+            template frequencies.
+        trace_memory (bool, optional): Defaults to False. Use tracemalloc
+            to get the peak memory of each stage, it is much slower.
+            Otherwise the peak memory is the max RSS of the process.
+        wide (int, optional): Defaults to 0. Number of the first level
+            siblings of the wide tree, 0 means not run the wide stages.
+
+    Returns:
+        dict: The benchmark report.
+    """
+    urls = make_corpus(num, seed, skew)
+    tracing = trace_memory and tracemalloc is not None
+    if tracing:
+        tracemalloc.start()
+    try:
+        stages = [bench_parse(urls)]
+        stage, pattern_maker = bench_load(urls)
+        stages.append(stage)
+        stage, clustered = bench_make(pattern_maker)
+        stages.append(stage)
+        for name in sorted(FORMATTERS):
+            stages.append(bench_format(name, clustered))
+        stage, pattern_matcher = bench_matcher_load(clustered)
+        stages.append(stage)
+        stages.append(bench_match(pattern_matcher, urls))
+        if wide > 0:
+            stage, pattern_maker = bench_load(make_wide_corpus(wide, seed),
+                                              'load_wide')
+            stages.append(stage)
+            stages.append(bench_make(pattern_maker, 'make_wide')[0])
+    finally:
+        if tracing:
+            tracemalloc.stop()
+
+    return {
+        'version': __version__,
+        'python': platform.python_version(),
+        'implementation': platform.python_implementation(),
+        'corpus': {'num': num, 'seed': seed, 'skew': skew, 'wide': wide},
+        'trace_memory': tracing,
+        'stages': dict((stage.name, stage.report()) for stage in stages),
+    }
+
+
+def main(argv=None):
+    argv = argv or sys.argv
+    parser = argparse.ArgumentParser(prog='python -m os_urlpattern.bench')
+    parser.add_argument('-n', '--num',
+                        help='number of urls (default: 10000)',
+                        default=10000,
+                        type=int,
+                        dest='num')
+    parser.add_argument('-s', '--seed',
+                        help='random seed (default: 0)',
+                        default=0,
+                        type=int,
+                        dest='seed')
+    parser.add_argument('-k', '--skew',
+                        help='skew of template frequencies (default: 1.0)',
+                        default=1.0,
+                        type=float,
+                        dest='skew')
+    parser.add_argument('-w', '--wide',
+                        help=('number of first level siblings of the wide '
+                              'tree (default: 0, disabled)'),
+                        default=0,
+                        type=int,
+                        dest='wide')
+    parser.add_argument('-m', '--trace-memory',
+                        help=('trace peak memory of each stage with '
+                              'tracemalloc'),
+                        default=False,
+                        action='store_true',
+                        dest='trace_memory')
+    parser.add_argument('-o', '--output',
+                        help='output file (default: stdout)',
+                        type=argparse.FileType('w'),
+                        default=sys.stdout,
+                        dest='output')
+    args = parser.parse_args(argv[1:])
+    report = run(args.num, args.seed, args.skew, args.trace_memory, args.wide)
+    args.output.write(json.dumps(report, indent=2, sort_keys=True))
+    args.output.write('\n')
+
+
+if __name__ == '__main__':
+    main()
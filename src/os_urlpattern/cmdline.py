@@ -6,15 +6,21 @@ pattern-make:
 pattern-matcher:
     Load pattern, match URL and get matched results.
 
+pattern-merge:
+    Load URL patterns with counts, cluster again and generate
+    consolidated URL patterns.
+
 """
 from __future__ import print_function, unicode_literals
 
 import argparse
+import json
 import logging.config
+import os
 import sys
 import time
 from collections import Counter
-from itertools import chain
+from operator import attrgetter
 
 from . import __version__
 from .compat import binary_stdin, binary_stdout
@@ -23,9 +29,15 @@ from .definition import DEFAULT_ENCODING
 from .exceptions import (InvalidCharException, InvalidPatternException,
                          IrregularURLException)
 from .formatter import FORMATTERS, pformat
-from .pattern_maker import PatternMaker
+from .pattern_maker import PatternMaker, StreamPatternMaker
 from .pattern_matcher import PatternMatcher
-from .utils import LogSpeedAdapter, MemoryUsageFormatter, pretty_counter
+from .utils import (LogSpeedAdapter, MemoryUsageFormatter, OutputBuffer,
+                    iter_lines, pretty_counter)
+
+try:
+    import tracemalloc
+except ImportError:
+    tracemalloc = None
 
 _DEFAULT_LOGGING = {
     'version': 1,
@@ -54,6 +66,10 @@ class Command(object):
     def __init__(self, config=None):
         self._config = config
         self._logger = logging.getLogger(self.__class__.__name__)
+        self._output = OutputBuffer(binary_stdout)
+
+    def _write_record(self, record):
+        self._output.write_line(record.encode(DEFAULT_ENCODING))
 
     def add_argument(self, parser):
 
@@ -92,6 +108,23 @@ class MakePatternCommand(Command):
         super(MakePatternCommand, self).process_args(args)
         if args.config:
             self._config.readfp(args.config[0])
+        if args.max_examples is not None:
+            self._config.set('make', 'max_examples', str(args.max_examples))
+        if args.snapshot and self._streaming(args):
+            sys.exit('error: --snapshot can not be used in streaming mode')
+        if args.cache_dir and self._streaming(args):
+            sys.exit('error: --cache-dir can not be used in streaming mode')
+        if args.merge and self._streaming(args):
+            sys.exit('error: --merge can not be used in streaming mode')
+        if args.dedupe and self._streaming(args):
+            sys.exit('error: --dedupe can not be used in streaming mode')
+        if args.dedupe and args.weighted:
+            sys.exit('error: --dedupe can not be used with --weighted')
+        if args.load_only and not args.snapshot:
+            sys.exit('error: --load-only must be used with --snapshot')
+
+    def _streaming(self, args):
+        return args.emit_every > 0 or args.emit_interval > 0
 
     def add_argument(self, parser):
         super(MakePatternCommand, self).add_argument(parser)
@@ -109,12 +142,89 @@ class MakePatternCommand(Command):
                             choices=FORMATTERS.keys(),
                             type=lambda s: s.upper())
 
+        parser.add_argument('-w', '--weighted',
+                            help=('weighted input, each line is url and '
+                                  'count separated by tab'),
+                            default=False,
+                            action='store_true',
+                            dest='weighted')
+
+        parser.add_argument('--dedupe',
+                            help='skip duplicated urls before parsing',
+                            default=False,
+                            action='store_true',
+                            dest='dedupe')
+
+        parser.add_argument('--max-examples',
+                            help=('keep at most K example urls of each '
+                                  'cluster (default: config, 0 means all)'),
+                            metavar='K',
+                            action='store',
+                            dest='max_examples',
+                            type=int)
+
+        parser.add_argument('--stats-json',
+                            help=('dump statistics of the cluster procedure '
+                                  'into json file, allocated memory is '
+                                  'traced by tracemalloc if available'),
+                            metavar='FILE',
+                            action='store',
+                            dest='stats_json')
+
+        parser.add_argument('--snapshot',
+                            help=('snapshot file for incremental clustering, '
+                                  'restored if exists and saved after '
+                                  'processing'),
+                            action='store',
+                            dest='snapshot')
+
+        parser.add_argument('--merge',
+                            help=('merge the snapshot files of the shards '
+                                  'before clustering'),
+                            metavar='SNAPSHOT',
+                            nargs='+',
+                            type=argparse.FileType('rb'),
+                            dest='merge')
+
+        parser.add_argument('--load-only',
+                            help=('only load urls and save the snapshot, '
+                                  'no clustering'),
+                            default=False,
+                            action='store_true',
+                            dest='load_only')
+
+        parser.add_argument('--cache-dir',
+                            help=('cache directory of clustered results, '
+                                  'unchanged url groups are not clustered '
+                                  'again'),
+                            metavar='DIR',
+                            action='store',
+                            dest='cache_dir')
+
+        parser.add_argument('--emit-every',
+                            help=('streaming mode, emit clustered results '
+                                  'every N urls (default: 0, disabled)'),
+                            default=0,
+                            action='store',
+                            dest='emit_every',
+                            type=int)
+
+        parser.add_argument('--emit-interval',
+                            help=('streaming mode, emit clustered results '
+                                  'every N seconds (default: 0, disabled)'),
+                            default=0,
+                            action='store',
+                            dest='emit_interval',
+                            type=float)
+
     def _load(self, pattern_maker, args):
         load_url = args.format_type in ('CLUSTER', 'INLINE')
+        streaming = self._streaming(args)
+        weighted = args.weighted
         stats = Counter()
         with LogSpeedAdapter(self._logger, 5000) as speed_logger:
             load = pattern_maker.load
-            for line in chain.from_iterable(args.inputs):
+            for line in iter_lines(args.inputs):
                 speed_logger.debug('[LOADING]')
                 stats['ALL'] += 1
                 line = line.strip()
@@ -122,8 +232,12 @@ class MakePatternCommand(Command):
                     stats['EMPTY'] += 1
                     continue
                 try:
+                    count = 1
+                    if weighted:
+                        line, count = self._split_weighted(line)
                     url = line.decode(DEFAULT_ENCODING)
-                    _, is_new = load(url, meta=url if load_url else None)
+                    _, is_new = load(url, meta=url if load_url else None,
+                                     count=count, uniq=not weighted)
                     if is_new:
                         stats['UNIQ'] += 1
                     stats['VALID'] += 1
@@ -139,22 +253,179 @@ class MakePatternCommand(Command):
                     self._logger.error('%s, %r', str(e), line)
                     stats['INVALID'] += 1
                     continue
+                if streaming and pattern_maker.should_emit():
+                    self._emit(pattern_maker, args)
+        if args.dedupe:
+            stats['DUPLICATE'] = pattern_maker.duplicates
         self._logger.debug('[LOADED] %s', pretty_counter(stats))
 
+    def _split_weighted(self, line):
+        url, _, count = line.rpartition(b'\t')
+        if not url:
+            raise ValueError('Missing count')
+        count = int(count)
+        if count <= 0:
+            raise ValueError('Invalid count %d' % count)
+        return url.rstrip(), count
+
+    def _emit(self, pattern_maker, args):
+        combine = args.format_type == 'ETE'
+        s = time.time()
+        max_examples = self._config.getint('make', 'max_examples')
+        emitted = pattern_maker.emit(combine)
+        self._logger.debug('[EMIT] %d %.2fs', len(emitted), time.time() - s)
+        for url_meta, root in emitted:
+            for record in pformat(args.format_type, url_meta, root,
+                                  max_examples=max_examples):
+                self._write_record(record)
+        self._output.flush()
+
     def _process(self, pattern_maker, args):
         combine = args.format_type == 'ETE'
+        max_examples = self._config.getint('make', 'max_examples')
         s = time.time()
         for maker in pattern_maker.makers:
             for root in maker.make(combine):
                 e = time.time()
                 self._logger.debug('[CLUSTER] %d %.2fs', root.count, e - s)
-                for record in pformat(args.format_type, maker.url_meta, root):
-                    print(record)
+                for record in pformat(args.format_type, maker.url_meta, root,
+                                      max_examples=max_examples):
+                    self._write_record(record)
                 s = time.time()
 
+    def _create_pattern_maker(self, args):
+        collect_stats = args.stats_json is not None
+        if self._streaming(args):
+            return StreamPatternMaker(self._config,
+                                      emit_every=args.emit_every,
+                                      emit_interval=args.emit_interval,
+                                      collect_stats=collect_stats)
+        if args.snapshot and os.path.exists(args.snapshot):
+            with open(args.snapshot, 'rb') as f:
+                pattern_maker = PatternMaker.restore(
+                    f, self._config, collect_stats, args.cache_dir,
+                    args.dedupe)
+            self._logger.debug('[RESTORED] %s', args.snapshot)
+            return pattern_maker
+        return PatternMaker(self._config,
+                            incremental=args.snapshot is not None,
+                            collect_stats=collect_stats,
+                            cache_dir=args.cache_dir,
+                            dedupe=args.dedupe)
+
+    def _save(self, pattern_maker, args):
+        tmp = args.snapshot + '.tmp'
+        with open(tmp, 'wb') as f:
+            pattern_maker.save(f)
+        os.rename(tmp, args.snapshot)
+        self._logger.debug('[SAVED] %s', args.snapshot)
+
+    def _merge(self, pattern_maker, args):
+        for f in args.merge:
+            pattern_maker.merge(PatternMaker.restore(f, self._config),
+                                uniq=not args.weighted)
+            self._logger.debug('[MERGED] %s', f.name)
+
+    def _dump_stats(self, pattern_maker, args):
+        with open(args.stats_json, 'w') as f:
+            json.dump(pattern_maker.stats().as_dict(), f,
+                      indent=2, sort_keys=True)
+        self._logger.debug('[STATS] %s', args.stats_json)
+
+    def run(self, args):
+        tracing = args.stats_json and tracemalloc is not None \
+            and not tracemalloc.is_tracing()
+        if tracing:
+            tracemalloc.start()
+        try:
+            self._run(self._create_pattern_maker(args), args)
+        finally:
+            if tracing:
+                tracemalloc.stop()
+
+    def _run(self, pattern_maker, args):
+        self._load(pattern_maker, args)
+        if args.merge:
+            self._merge(pattern_maker, args)
+        if self._streaming(args):
+            if pattern_maker.pending > 0:
+                self._emit(pattern_maker, args)
+        elif args.load_only:
+            self._save(pattern_maker, args)
+        else:
+            self._process(pattern_maker, args)
+            cache = pattern_maker.cache
+            if cache is not None:
+                self._logger.debug('[CACHE] hits: %d, misses: %d',
+                                   cache.hits, cache.misses)
+            if args.snapshot:
+                self._save(pattern_maker, args)
+        if args.stats_json:
+            self._dump_stats(pattern_maker, args)
+
+
+class MergePatternCommand(Command):
+
+    def process_args(self, args):
+        super(MergePatternCommand, self).process_args(args)
+        if args.config:
+            self._config.readfp(args.config[0])
+
+    def add_argument(self, parser):
+        super(MergePatternCommand, self).add_argument(parser)
+        parser.add_argument('-c', '--config',
+                            help='config file',
+                            nargs=1,
+                            type=argparse.FileType('r'),
+                            dest='config')
+
+        parser.add_argument('-f', '--formatter',
+                            help='output formatter (default: JSON)',
+                            default='JSON',
+                            action='store',
+                            dest='format_type',
+                            choices=FORMATTERS.keys(),
+                            type=lambda s: s.upper())
+
+    def _parse(self, line):
+        if line.startswith(b'{'):
+            record = json.loads(line.decode(DEFAULT_ENCODING))
+            return record['ptn'], int(record['cnt'])
+        return line.decode(DEFAULT_ENCODING), 1
+
+    def _load(self, pattern_maker, args):
+        load_pattern = args.format_type in ('CLUSTER', 'INLINE')
+        stats = Counter()
+        with LogSpeedAdapter(self._logger, 1000) as speed_logger:
+            load = pattern_maker.load_pattern
+            for line in iter_lines(args.inputs):
+                speed_logger.debug('[LOADING]')
+                stats['ALL'] += 1
+                line = line.strip()
+                if not line:
+                    stats['EMPTY'] += 1
+                    continue
+                try:
+                    pattern, count = self._parse(line)
+                    load(pattern, meta=pattern if load_pattern else None,
+                         count=count)
+                    stats['VALID'] += 1
+                except Exception as e:
+                    self._logger.warn('%s, %r', str(e), line)
+                    stats['INVALID'] += 1
+        self._logger.debug('[LOADED] %s', pretty_counter(stats))
+
+    def _process(self, pattern_maker, args):
+        combine = args.format_type == 'ETE'
+        for maker in pattern_maker.makers:
+            for root in maker.make(combine):
+                for record in pformat(args.format_type, maker.url_meta, root):
+                    self._write_record(record)
+
     def run(self, args):
         pattern_maker = PatternMaker(self._config)
         self._load(pattern_maker, args)
+        self._logger.debug('[ABSORBED] %d', pattern_maker.absorb())
         self._process(pattern_maker, args)
 
 
@@ -172,7 +443,8 @@ class MatchPatternCommand(Command):
                             dest='pattern_files')
 
         parser.add_argument('-a', '--all-matched',
-                            help='all matched patterns',
+                            help=('all matched patterns, the most specific '
+                                  'first'),
                             default=False,
                             action='store_true',
                             dest='all_matched')
@@ -186,7 +458,7 @@ class MatchPatternCommand(Command):
                            ', '.join([p.name for p in p_inputs]))
         with LogSpeedAdapter(self._logger, 1000) as speed_logger:
             load = pattern_matcher.load
-            for line in chain.from_iterable(p_inputs):
+            for line in iter_lines(p_inputs):
                 speed_logger.debug('[LOADING]')
                 stats['ALL'] += 1
                 line = line.rstrip()
@@ -208,8 +480,9 @@ class MatchPatternCommand(Command):
             url = raw_url.decode(DEFAULT_ENCODING)
             result = pattern_matcher.match(url)
             if not args.all_matched:
-                result = sorted(result, reverse=True)
-                result = result[:1]
+                result = result and [max(result, key=attrgetter('sort_key'))]
+            else:
+                result.sort(key=attrgetter('sort_key'), reverse=True)
             result = '\t'.join([r.meta for r in result]
                                ).encode(DEFAULT_ENCODING)
         except (InvalidPatternException,
@@ -226,17 +499,14 @@ class MatchPatternCommand(Command):
 
     def _match(self, pattern_matcher, args):
         speed_logger = LogSpeedAdapter(self._logger, 5000)
-        write = binary_stdout.write
-        for line in chain.from_iterable(args.inputs):
+        write_line = self._output.write_line
+        for line in iter_lines(args.inputs):
             speed_logger.debug('[MATCHING]')
             line = line.strip()
             result = self._match_result(pattern_matcher, line, args)
             if not result:
                 result = b'N'
-            write(result)
-            write(b'\t')
-            write(line)
-            write(b'\n')
+            write_line(b'\t'.join((result, line)))
 
     def run(self, args):
         pattern_matcher = PatternMatcher()
@@ -250,7 +520,8 @@ def _execute(command, argv=None):
     command.add_argument(parser)
     args = parser.parse_args(argv[1:])
     command.process_args(args)
-    command.run(args)
+    with command._output:
+        command.run(args)
 
 
 def make(argv=None):
@@ -259,3 +530,7 @@ def make(argv=None):
 
 def match(argv=None):
     _execute(MatchPatternCommand(), argv)
+
+
+def merge(argv=None):
+    _execute(MergePatternCommand(get_default_config()), argv)
@@ -14,6 +14,7 @@ if _PY3:
     itervalues = operator.methodcaller("values")
     from urllib.parse import urlparse, ParseResult
     from configparser import ConfigParser
+    import pickle
     binary_stdin = sys.stdin.buffer
     binary_stdout = sys.stdout.buffer
 else:
@@ -25,5 +26,6 @@ else:
     itervalues = operator.methodcaller("itervalues")
     from urlparse import urlparse, ParseResult
     from ConfigParser import ConfigParser
+    import cPickle as pickle
     binary_stdin = sys.stdin
     binary_stdout = sys.stdout
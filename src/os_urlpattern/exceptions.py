@@ -12,3 +12,7 @@ class InvalidPatternException(Exception):
 
 class InvalidCharException(Exception):
     pass
+
+
+class ClusterBudgetExceededException(Exception):
+    pass
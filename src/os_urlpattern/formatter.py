@@ -7,7 +7,19 @@ import sys
 
 from .definition import BasePatternRule, Symbols
 from .parse_utils import pack
-from .utils import dump_tree, get_classes
+from .utils import dump_tree, get_classes, iter_leaves, iter_preorder
+
+
+def _iter_examples(root, max_examples=0):
+    num = 0
+    for leaf in iter_leaves(root):
+        if leaf.meta is None:
+            continue
+        for obj in leaf.meta:
+            if 0 < max_examples <= num:
+                return
+            num += 1
+            yield obj
 
 
 class Formatter(object):
@@ -33,7 +45,11 @@ class Formatter(object):
 
 
 class PatternFormatter(Formatter):
-    """Pattern only formatter."""
+    """Pattern only formatter.
+
+    The pattern of a truncated cluster is output as a normal one, use
+    JsonFormatter to get the flag.
+    """
 
     def format(self, url_meta, root, **kwargs):
         """Yield URL pattern string.
@@ -65,6 +81,8 @@ class ClusterFormatter(PatternFormatter):
             url_meta (URLMeta): The URLMeta object.
             root (TreeNode): Root of a clustered piece tree.
             **kwargs: Arbitray keyword arguments.
+                max_examples (int): Yield at most max_examples meta
+                    data strings, 0 means all. Defaults to 0.
 
         Yields:
             object: URL pattern string first, then all meta
@@ -74,11 +92,8 @@ class ClusterFormatter(PatternFormatter):
         for r in super(ClusterFormatter, self).format(url_meta, root, **kwargs):
             yield r
 
-        for nodes in dump_tree(root):
-            if nodes[-1].meta is None:
-                continue
-            for obj in nodes[-1].meta:
-                yield '\t'.join(('', str(obj)))
+        for obj in _iter_examples(root, kwargs.get('max_examples', 0)):
+            yield '\t'.join(('', str(obj)))
 
 
 class InlineFormatter(PatternFormatter):
@@ -94,6 +109,8 @@ class InlineFormatter(PatternFormatter):
             url_meta (URLMeta): The URLMeta object.
             root (TreeNode): Root of a clustered piece tree.
             **kwargs: Arbitray keyword arguments.
+                max_examples (int): Yield at most max_examples lines,
+                    0 means all. Defaults to 0.
 
         Yields:
             object: URL pattern string + '\t' + str(meta)
@@ -103,11 +120,8 @@ class InlineFormatter(PatternFormatter):
         for r in super(InlineFormatter, self).format(url_meta, root, **kwargs):
             url_pattern_string = r
 
-        for nodes in dump_tree(root):
-            if nodes[-1].meta is None:
-                continue
-            for obj in nodes[-1].meta:
-                yield '\t'.join((url_pattern_string, str(obj)))
+        for obj in _iter_examples(root, kwargs.get('max_examples', 0)):
+            yield '\t'.join((url_pattern_string, str(obj)))
 
 
 class JsonFormatter(Formatter):
@@ -116,6 +130,7 @@ class JsonFormatter(Formatter):
     Yiled Json string, {"ptn":url_pattern, "cnt":count}
         ptn: URL pattern string.
         cnt: Number of uniq path in the cluster.
+        trunc: True, only if clustering is truncated.
     """
 
     def format(self, url_meta, root, **kwargs):
@@ -130,10 +145,14 @@ class JsonFormatter(Formatter):
             str: Json string, key-value:
                 ptn: URL pattern string.
                 cnt: Number of uniq path in the cluster.
+                trunc: True, only if clustering is truncated.
         """
         for nodes in dump_tree(root):
             p = pack(url_meta, [p.pattern for p in nodes[1:]])
-            yield json.dumps({'ptn': p, 'cnt': root.count})
+            obj = {'ptn': p, 'cnt': root.count}
+            if getattr(root, 'truncated', False):
+                obj['trunc'] = True
+            yield json.dumps(obj)
             break
 
 
@@ -194,13 +213,12 @@ def get_ete_tree(root_node, format=str):
     """
     from ete3 import Tree
 
-    def add_children(node, ete_node):
-        for child in node.children:
-            ete_child = ete_node.add_child(name=format(child))
-            add_children(child, ete_child)
-
     ete_root_node = Tree(name=format(root_node))
-    add_children(root_node, ete_root_node)
+    ete_nodes = {root_node: ete_root_node}
+    for node in iter_preorder(root_node):
+        if node is not root_node:
+            ete_nodes[node] = ete_nodes[node.parrent].add_child(
+                name=format(node))
     return ete_root_node
 
 
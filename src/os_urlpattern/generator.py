@@ -0,0 +1,243 @@
+"""Synthetic URL generator.
+
+Generate URLs from templates which model the common site structures,
+each template has the URL pattern expected to be clustered::
+
+    $ python -m os_urlpattern.generator -n 1000000 | pattern-make -f pattern
+    $ python -m os_urlpattern.generator -p > patterns.txt
+
+"""
+from __future__ import print_function, unicode_literals
+
+import argparse
+import bisect
+import random
+import string
+import sys
+
+from .compat import binary_stdout
+from .definition import DEFAULT_ENCODING
+
+HEXDIGITS = '0123456789abcdef'
+
+
+def digits(min_len, max_len=None):
+    """Field of digits, such as numeric id.
+
+    Args:
+        min_len (int): Min length.
+        max_len (int, optional): Defaults to None. Max length,
+            same as min_len if not specified.
+
+    Returns:
+        callable: Generate field value with a Random object.
+    """
+    max_len = min_len if max_len is None else max_len
+
+    def field(rand):
+        return ''.join([rand.choice(string.digits)
+                        for _ in range(rand.randint(min_len, max_len))])
+    return field
+
+
+def hexdigest(length=32):
+    """Field of lower case hex digits, such as md5 hash."""
+    def field(rand):
+        return ''.join([rand.choice(HEXDIGITS) for _ in range(length)])
+    return field
+
+
+def word(min_len=3, max_len=10):
+    """Field of lower case ascii letters."""
+    def field(rand):
+        return ''.join([rand.choice(string.ascii_lowercase)
+                        for _ in range(rand.randint(min_len, max_len))])
+    return field
+
+
+def slug(num, sep='-'):
+    """Field of num words joined with sep."""
+    w = word()
+
+    def field(rand):
+        return sep.join([w(rand) for _ in range(num)])
+    return field
+
+
+def date(start_year=2000, end_year=2019, sep='/'):
+    """Field of date, yyyy/mm/dd."""
+    def field(rand):
+        return sep.join(['%04d' % rand.randint(start_year, end_year),
+                         '%02d' % rand.randint(1, 12),
+                         '%02d' % rand.randint(1, 28)])
+    return field
+
+
+def percent_encoded(num):
+    """Field of num %-encoded UTF-8 CJK characters."""
+    def field(rand):
+        encoded = []
+        for _ in range(num):
+            c = rand.randint(0x4e00, 0x9fa5)
+            encoded.append('%%%02X%%%02X%%%02X' % (0xe0 | (c >> 12),
+                                                   0x80 | ((c >> 6) & 0x3f),
+                                                   0x80 | (c & 0x3f)))
+        return ''.join(encoded)
+    return field
+
+
+class URLTemplate(object):
+    """URL template.
+
+    Args:
+        name (str): Name of the template.
+        url_format (str): URL format string, the fields values are
+            filled in by str.format.
+        fields (sequence): The field callables.
+        pattern (str): The expected URL pattern string.
+    """
+
+    __slots__ = ('name', 'url_format', 'fields', 'pattern')
+
+    def __init__(self, name, url_format, fields, pattern):
+        self.name = name
+        self.url_format = url_format
+        self.fields = fields
+        self.pattern = pattern
+
+    def generate(self, rand):
+        """Generate a URL.
+
+        Args:
+            rand (random.Random): The random object.
+
+        Returns:
+            str: The generated URL.
+        """
+        return self.url_format.format(*[f(rand) for f in self.fields])
+
+
+DEFAULT_TEMPLATES = (
+    URLTemplate('item',
+                'http://www.example.com/item/{0}.html',
+                [digits(1, 8)],
+                '/item/[0-9]+[\\.]html'),
+    URLTemplate('news',
+                'http://www.example.com/news/{0}/{1}.html',
+                [date(), digits(6)],
+                '/news/[0-9]{4}/[0-9]{2}/[0-9]{2}/[0-9]{6}[\\.]html'),
+    URLTemplate('search',
+                'http://www.example.com/search?q={0}&page={1}',
+                [word(), digits(1, 2)],
+                '/search[\\?]q=[a-z]+&page=[0-9]+'),
+    URLTemplate('blog',
+                'http://www.example.com/blog/{0}',
+                [slug(3)],
+                '/blog/[a-z]+[\\-][a-z]+[\\-][a-z]+'),
+    URLTemplate('user',
+                'http://www.example.com/user/{0}_{1}',
+                [word(), digits(1, 5)],
+                '/user/[a-z]+[_][0-9]+'),
+    URLTemplate('file',
+                'http://www.example.com/file/{0}',
+                [hexdigest(32)],
+                '/file/[0-9a-z]{32}'),
+    URLTemplate('doc',
+                'http://www.example.com/doc/{0}#{1}',
+                [digits(1, 6), word()],
+                '/doc/[0-9]+#[a-z]+'),
+    URLTemplate('tag',
+                'http://www.example.com/tag/{0}',
+                [percent_encoded(2)],
+                '/tag/[%0-9A-Z]{18}'),
+)
+
+
+class URLGenerator(object):
+    """Generate URLs from templates.
+
+    The templates are chosen with skewed frequencies, the weight of
+    the i-th template is 1 / (i + 1) ** skew.
+
+    Args:
+        templates (sequence, optional): Defaults to None. The URL
+            templates, DEFAULT_TEMPLATES if not specified.
+        seed (int, optional): Defaults to 0. The random seed.
+        skew (float, optional): Defaults to 1.0. Zero means uniform.
+    """
+
+    def __init__(self, templates=None, seed=0, skew=1.0):
+        self._templates = tuple(DEFAULT_TEMPLATES
+                                if templates is None else templates)
+        self._seed = seed
+        total = 0
+        self._cum_weights = []
+        for i in range(len(self._templates)):
+            total += 1.0 / (i + 1) ** skew
+            self._cum_weights.append(total)
+
+    @property
+    def templates(self):
+        """tuple: The URL templates."""
+        return self._templates
+
+    @property
+    def patterns(self):
+        """list: The expected URL pattern strings."""
+        return [t.pattern for t in self._templates]
+
+    def generate(self, num):
+        """Yield generated URLs, no URL is held in memory.
+
+        Args:
+            num (int): Number of URLs.
+
+        Yields:
+            tuple: 2-tuple, (template, url).
+        """
+        rand = random.Random(self._seed)
+        templates = self._templates
+        cum_weights = self._cum_weights
+        total = cum_weights[-1]
+        for _ in range(num):
+            t = templates[bisect.bisect(cum_weights, rand.random() * total)]
+            yield t, t.generate(rand)
+
+
+def main(argv=None):
+    argv = argv or sys.argv
+    parser = argparse.ArgumentParser(prog='python -m os_urlpattern.generator')
+    parser.add_argument('-n', '--num',
+                        help='number of urls (default: 10000)',
+                        default=10000,
+                        type=int,
+                        dest='num')
+    parser.add_argument('-s', '--seed',
+                        help='random seed (default: 0)',
+                        default=0,
+                        type=int,
+                        dest='seed')
+    parser.add_argument('-k', '--skew',
+                        help='skew of template frequencies (default: 1.0)',
+                        default=1.0,
+                        type=float,
+                        dest='skew')
+    parser.add_argument('-p', '--patterns',
+                        help='output the expected patterns instead of urls',
+                        default=False,
+                        action='store_true',
+                        dest='patterns')
+    args = parser.parse_args(argv[1:])
+    generator = URLGenerator(seed=args.seed, skew=args.skew)
+    write = binary_stdout.write
+    if args.patterns:
+        lines = generator.patterns
+    else:
+        lines = (url for _, url in generator.generate(args.num))
+    for line in lines:
+        write(line.encode(DEFAULT_ENCODING))
+        write(b'\n')
+
+
+if __name__ == '__main__':
+    main()
@@ -268,6 +268,33 @@ def parse_query_string(query_string):
     return tuple(kv_list[True]), tuple(kv_list[False])
 
 
+# global variables for intern_rules
+MAX_INTERNED_RULES = 1 << 16
+_INTERNED_RULES = {}
+
+
+def intern_rules(rules):
+    """Intern the rules tuple and get its fuzzy rule.
+
+    The parsed pieces of the same structure share one rules tuple and
+    one fuzzy rule string. The interned rules are cleared when the
+    number of them exceeds MAX_INTERNED_RULES.
+
+    Args:
+        rules (tuple): The rules.
+
+    Returns:
+        tuple: 2-tuple, (interned_rules, fuzzy_rule).
+    """
+    interned = _INTERNED_RULES.get(rules)
+    if interned is None:
+        if len(_INTERNED_RULES) >= MAX_INTERNED_RULES:
+            _INTERNED_RULES.clear()
+        interned = _INTERNED_RULES[rules] = (
+            rules, ''.join(sorted(set(rules))))
+    return interned
+
+
 def mix(pieces, rules):
     """Combine the sub-pieces and sub-rules.
 
@@ -298,7 +325,7 @@ def mix(pieces, rules):
         else:
             if t_rules and t_mix:
                 mixed_pieces.append(''.join(t_pieces))
-                mixed_rules.append(''.join(sorted(set(t_rules))))
+                mixed_rules.append(intern_rules(tuple(t_rules))[1])
                 t_pieces = []
                 t_rules = []
             t_mix = False
@@ -306,7 +333,7 @@ def mix(pieces, rules):
         t_rules.append(rule)
     if t_mix:
         mixed_pieces.append(''.join(t_pieces))
-        mixed_rules.append(''.join(sorted(set(t_rules))))
+        mixed_rules.append(intern_rules(tuple(t_rules))[1])
     else:
         mixed_pieces.extend(t_pieces)
         mixed_rules.extend(t_rules)
@@ -412,23 +439,30 @@ class ParsedPiece(object):
     """
     __slots__ = ('pieces', 'rules', '_piece', '_piece_length', '_fuzzy_rule')
 
-    def __init__(self, pieces, rules):
+    def __init__(self, pieces, rules, fuzzy_rule=None, piece_length=None):
         """Init the ParsedPiece object.
 
         Args:
             pieces (tuple): The tuple of parsed pieces.
             rules (tuple): The tuple of the rules of each parsed pieces.
+            fuzzy_rule (str, optional): Defaults to None. The fuzzy rule,
+                joined from the rules if not specified.
+            piece_length (int, optional): Defaults to None. The literal
+                length of the piece, scanned from the piece if not
+                specified.
         """
         self.pieces = pieces
         self.rules = rules
-        self._piece_length = -1
+        self._piece_length = piece_length
         self._piece = pieces[0] if len(pieces) == 1 else None
-        self._fuzzy_rule = rules[0] if len(rules) == 1 else None
+        if fuzzy_rule is None and len(rules) == 1:
+            fuzzy_rule = rules[0]
+        self._fuzzy_rule = fuzzy_rule
 
     @property
     def fuzzy_rule(self):
         if not self._fuzzy_rule:
-            self._fuzzy_rule = ''.join(sorted(set(self.rules)))
+            self._fuzzy_rule = intern_rules(self.rules)[1]
         return self._fuzzy_rule
 
     @property
@@ -440,28 +474,34 @@ class ParsedPiece(object):
         Note:
 
             '[%]{2}' have 6 characters, but literal length is 2.
+            '[0-9]+' is a pattern unit with variable length, -1.
 
         Returns:
-            int: The literal length of the piece.
+            int: The literal length of the piece, -1 if variable.
         """
-        if self._piece_length < 0:
+        if self._piece_length is None:
             piece = self.piece
-            length_base = length = len(piece)
+            l = len(piece)
+            length = 0
             idx = 0
-            while idx < length_base:
-                c = piece[idx]
-                if c == Symbols.BRACKETS_L or c == Symbols.BRACKETS_R:
-                    if idx == 0 or piece[idx - 1] != Symbols.BACKSLASH:
-                        length += -1
-                elif c == Symbols.BACKSLASH:
-                    if piece[idx + 1] != Symbols.BACKSLASH:
-                        length += -1
-                elif c == Symbols.BRACES_L:
-                    if piece[idx - 1] == Symbols.BRACKETS_R:
-                        e = piece.index(Symbols.BRACES_R, idx)
-                        length += int(piece[idx + 1:e]) - 1 - (e - idx + 1)
-                        idx = e
+            while idx < l:
+                if piece[idx] != Symbols.BRACKETS_L:
+                    length += 1
+                    idx += 1
+                    continue
                 idx += 1
+                while piece[idx] != Symbols.BRACKETS_R:
+                    idx += 2 if piece[idx] == Symbols.BACKSLASH else 1
+                idx += 1
+                if idx < l and piece[idx] == Symbols.BRACES_L:
+                    e = piece.index(Symbols.BRACES_R, idx)
+                    length += int(piece[idx + 1:e])
+                    idx = e + 1
+                elif idx < l and piece[idx] == Symbols.PLUS:
+                    length = -1
+                    break
+                else:
+                    length += 1
 
             self._piece_length = length
         return self._piece_length
@@ -520,7 +560,7 @@ class PieceParser(object):
 
         self._reset()
         self._preprocess(piece)
-        return self._create_parsed_piece()
+        return self._create_parsed_piece(len(piece))
 
     def _preprocess(self, piece):
         for c in piece:
@@ -547,8 +587,10 @@ class PieceParser(object):
             return specify_rule(rule, len(letter))
         return letter
 
-    def _create_parsed_piece(self):
-        return ParsedPiece(tuple(self._pieces), tuple(self._rules))
+    def _create_parsed_piece(self, piece_length):
+        rules, fuzzy_rule = intern_rules(tuple(self._rules))
+        return ParsedPiece(tuple(self._pieces), rules, fuzzy_rule,
+                           piece_length)
 
 
 def fuzzy_digest(url_meta, objs):
@@ -700,6 +742,27 @@ def parse_pattern_string(pattern_string):
     return tuple(pattern_unit_strings)
 
 
+def parse_pattern_piece(pattern_string):
+    """Parse a pattern string into ParsedPiece object.
+
+    Each pattern unit is a sub-piece and its fuzzy rule is the
+    sub-rule, so the patterns can be clustered like pieces.
+
+    Args:
+        pattern_string (str): The pattern string to be parsed.
+
+    Returns:
+        ParsedPiece: The ParsedPiece object.
+    """
+    from .pattern import Pattern
+    pattern_units = Pattern(pattern_string).pattern_units
+    pieces = tuple([u.pattern_unit_string for u in pattern_units])
+    rules = tuple([u.fuzzy_rule for u in pattern_units])
+    fuzzy_rule = ''.join(sorted(set.union(
+        *[u.rules for u in pattern_units])))
+    return ParsedPiece(pieces, rules, fuzzy_rule)
+
+
 def parse_pattern_unit_string(pattern_unit_string):
     """Parse pattern unit string into rules and literal num.
 
@@ -3,7 +3,7 @@
 from __future__ import unicode_literals
 
 from .definition import DIGIT_AND_ASCII_RULE_SET, BasePatternRule
-from .parse_utils import ParsedPiece, fuzzy_join, mix
+from .parse_utils import ParsedPiece, fuzzy_join, intern_rules, mix
 from .utils import pick
 
 
@@ -97,8 +97,9 @@ class LastDotSplitFuzzyView(ParsedPieceView):
             if rule == BasePatternRule.DOT:
                 dot_idx = part_num - idx - 1
                 break
-        self._parsed_pieces = [ParsedPiece((self.parsed_piece.piece,),
-                                           (self.parsed_piece.fuzzy_rule,))]
+        self._parsed_pieces = [ParsedPiece(
+            (self.parsed_piece.piece,), (self.parsed_piece.fuzzy_rule,),
+            piece_length=self.parsed_piece.piece_length)]
         if dot_idx is not None:
             skip = False
             for rule in self.parsed_piece.rules[dot_idx + 1:]:
@@ -111,7 +112,7 @@ class LastDotSplitFuzzyView(ParsedPieceView):
                 pieces.append(''.join(self.parsed_piece.pieces[0:dot_idx]))
                 pieces.append(self.parsed_piece.pieces[dot_idx])
                 rules.append(
-                    ''.join(sorted(set(self.parsed_piece.rules[0:dot_idx]))))
+                    intern_rules(self.parsed_piece.rules[0:dot_idx])[1])
                 rules.append(self.parsed_piece.rules[dot_idx])
                 mixed_pieces, mixed_rules = mix(
                     self.parsed_piece.pieces[dot_idx + 1:],
@@ -133,11 +134,45 @@ class FuzzyView(ParsedPieceView):
     def parsed_pieces(self):
         if self._parsed_pieces:
             return self._parsed_pieces
-        self._parsed_pieces = [ParsedPiece((self.parsed_piece.piece,),
-                                           (self.parsed_piece.fuzzy_rule,))]
+        self._parsed_pieces = [ParsedPiece(
+            (self.parsed_piece.piece,), (self.parsed_piece.fuzzy_rule,),
+            piece_length=self.parsed_piece.piece_length)]
         return self._parsed_pieces
 
 
+class ViewCache(object):
+    """Cache of the parsed piece views.
+
+    The same parsed piece is viewed again and again at different
+    cluster stages and recursions, the views are built only once.
+    """
+
+    __slots__ = ('_views',)
+
+    def __init__(self):
+        self._views = {}
+
+    def __len__(self):
+        return len(self._views)
+
+    def get(self, view_cls, parsed_piece):
+        """Get the view of the parsed piece.
+
+        Args:
+            view_cls (class): The class of ParsedPieceView.
+            parsed_piece (ParsedPiece): The parsed piece.
+
+        Returns:
+            ParsedPieceView: The cached view object.
+        """
+        key = (view_cls, parsed_piece.pieces, parsed_piece.rules)
+        view = self._views.get(key, None)
+        if view is None:
+            view = view_cls(parsed_piece)
+            self._views[key] = view
+        return view
+
+
 def view_cls_from_pattern(pattern, is_last_path=False):
     """Get ParsedPieceView class from pattern.
 
@@ -19,9 +19,9 @@ def parse(url_or_pattern):
     url_meta = None
     parsed_pieces = None
     if url_or_pattern.startswith('/'):  # URL pattern
-        from .pattern_matcher import MatchPattern
+        from .pattern_matcher import get_match_pattern
         url_meta, pattern_strings = analyze_url_pattern_string(url_or_pattern)
-        parsed_pieces = tuple([MatchPattern(p, i == url_meta.path_depth)
+        parsed_pieces = tuple([get_match_pattern(p, i == url_meta.path_depth)
                                for i, p in enumerate(pattern_strings, 1)])
     else:  # URL
         parser = PieceParser()
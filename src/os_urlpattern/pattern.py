@@ -6,9 +6,59 @@ import re
 
 from .utils import pick
 
+# global variables for pattern interning
+MAX_INTERNED_PATTERNS = 1 << 16
+_PATTERN_UNITS = {}
+_PATTERN_UNIT_TUPLES = {}
+
+
+def get_pattern_unit(pattern_unit_string):
+    """Get the interned PatternUnit object.
+
+    The same pattern unit strings appear in many patterns, they are
+    parsed only once. The interned objects are cleared when the number
+    of them exceeds MAX_INTERNED_PATTERNS.
+
+    Args:
+        pattern_unit_string (str): The pattern unit string.
+
+    Returns:
+        PatternUnit: The shared PatternUnit object.
+    """
+    pattern_unit = _PATTERN_UNITS.get(pattern_unit_string)
+    if pattern_unit is None:
+        if len(_PATTERN_UNITS) >= MAX_INTERNED_PATTERNS:
+            _PATTERN_UNITS.clear()
+        pattern_unit = _PATTERN_UNITS[pattern_unit_string] = PatternUnit(
+            pattern_unit_string)
+    return pattern_unit
+
+
+def get_pattern_units(pattern_string):
+    """Get the interned PatternUnit objects of the pattern string.
+
+    Args:
+        pattern_string (str): The pattern string.
+
+    Returns:
+        tuple: The shared PatternUnit objects.
+    """
+    pattern_units = _PATTERN_UNIT_TUPLES.get(pattern_string)
+    if pattern_units is None:
+        from .parse_utils import parse_pattern_string
+        pattern_units = tuple([get_pattern_unit(u) for u in
+                               parse_pattern_string(pattern_string)])
+        if len(_PATTERN_UNIT_TUPLES) >= MAX_INTERNED_PATTERNS:
+            _PATTERN_UNIT_TUPLES.clear()
+        _PATTERN_UNIT_TUPLES[pattern_string] = pattern_units
+    return pattern_units
+
 
 class PatternUnit(object):
-    """Sub-piece of pattern."""
+    """Sub-piece of pattern.
+
+    Use get_pattern_unit to get a shared one.
+    """
 
     __slots__ = ('pattern_unit_string', 'rules', 'num', '_fuzzy_rule')
 
@@ -67,11 +117,8 @@ class Pattern(object):
     @property
     def pattern_units(self):
         """tuple: Pattern units."""
-
-        from .parse_utils import parse_pattern_string
         if self._pattern_units is None:
-            self._pattern_units = tuple([PatternUnit(
-                u) for u in parse_pattern_string(self.pattern_string)])
+            self._pattern_units = get_pattern_units(self.pattern_string)
         return self._pattern_units
 
     def __str__(self):
@@ -91,6 +138,52 @@ class Pattern(object):
                 ''.join(('^', self.pattern_string, '$')))
         return True if re.match(self._pattern_regex, piece) else False
 
+    def covers(self, pattern):
+        """Whether all the pieces matched by pattern are matched by this.
+
+        The check is conservative, each unit of this pattern should
+        cover one or more consecutive units of the other pattern: a
+        literal unit covers the same unit, a fixed-length unit covers
+        the units of the sub-rules with the same total length and a
+        "+" unit covers the units of the sub-rules with any length.
+
+        Args:
+            pattern (Pattern): The other pattern.
+
+        Returns:
+            bool: Whether the pattern is covered.
+        """
+        if self.pattern_string == pattern.pattern_string:
+            return True
+        units = pattern.pattern_units
+        positions = set([0])
+        for unit in self.pattern_units:
+            next_positions = set()
+            for idx in positions:
+                if unit.is_literal():
+                    if idx < len(units) and units[idx].pattern_unit_string \
+                            == unit.pattern_unit_string:
+                        next_positions.add(idx + 1)
+                    continue
+                length = 0
+                for end in range(idx, len(units)):
+                    if not units[end].rules <= unit.rules:
+                        break
+                    if unit.num < 0:
+                        next_positions.add(end + 1)
+                        continue
+                    if units[end].num < 0:
+                        break
+                    length += units[end].num
+                    if length >= unit.num:
+                        if length == unit.num:
+                            next_positions.add(end + 1)
+                        break
+            if not next_positions:
+                return False
+            positions = next_positions
+        return len(units) in positions
+
     @property
     def fuzzy_rule(self):
         """str: All rules of the pattern join into a string."""
@@ -2,32 +2,104 @@
 """
 from __future__ import unicode_literals
 
-from collections import Counter, OrderedDict, namedtuple
+import time
+from collections import OrderedDict, namedtuple
 
-from .compat import itervalues
+from .compat import iteritems, itervalues
+from .exceptions import ClusterBudgetExceededException
 from .parse_utils import (EMPTY_PARSED_PIECE, URLMeta, specify_rule,
                           wildcard_rule)
-from .parsed_piece_view import LastDotSplitFuzzyView, MixedView, MultiView
+from .parsed_piece_view import (LastDotSplitFuzzyView, MixedView, MultiView,
+                                ViewCache)
 from .pattern import Pattern
 from .piece_pattern_node import (PiecePatternNode, build_from_parsed_pieces,
-                                 build_from_piece_pattern_nodes)
+                                 copy_piece_pattern_tree)
 from .utils import Bag, cached_property, dump_tree, pick
 
+try:
+    import tracemalloc
+except ImportError:
+    tracemalloc = None
 
-class TBag(Bag):
-    __slots__ = ('stats',)
+
+def _traced_memory():
+    if tracemalloc is not None and tracemalloc.is_tracing():
+        return tracemalloc.get_traced_memory()[0]
+    return 0
+
+
+class ClusterStats(object):
+    """Statistics of the cluster procedure.
+
+    Record calls, wall time, number of processed objects and allocated
+    memory of each cluster class, each cluster processor level and the
+    tree splitting. The allocated memory is recorded only when tracemalloc
+    is tracing.
+
+    The records are inclusive, the nested clustering of the multi pattern
+    clusters are counted in both the nested and the outer records.
+    """
+
+    __slots__ = ('_records',)
 
     def __init__(self):
-        super(TBag, self).__init__()
-        self.stats = Counter()
+        self._records = OrderedDict()
+
+    def start(self):
+        """Start a record.
+
+        Returns:
+            tuple: The start state, should be passed to stop.
+        """
+        return time.time(), _traced_memory()
+
+    def stop(self, group, name, started, objs=0):
+        """Stop a record.
+
+        Args:
+            group (str): The group of the record.
+            name (str): The name of the record.
+            started (tuple): The start state.
+            objs (int, optional): Defaults to 0. Number of processed objects.
+        """
+        start_time, start_memory = started
+        key = (group, name)
+        record = self._records.get(key)
+        if record is None:
+            record = self._records[key] = [0, 0.0, 0, 0]
+        record[0] += 1
+        record[1] += time.time() - start_time
+        record[2] += objs
+        record[3] += _traced_memory() - start_memory
+
+    def as_dict(self):
+        """Get the statistics as a dict.
+
+        Returns:
+            dict: {group: {name: {calls, seconds, objs, memory}}}.
+        """
+        d = {}
+        for (group, name), record in self._records.items():
+            d.setdefault(group, {})[name] = dict(
+                zip(('calls', 'seconds', 'objs', 'memory'), record))
+        return d
 
-    @property
-    def count(self):
-        return self.stats['count']
+
+class TBag(Bag):
+    """Bag of objects with the total count.
+
+    The objects should be uniq, they are kept in a list.
+    """
+
+    __slots__ = ('count',)
+
+    def __init__(self):
+        self._objs = []
+        self.count = 0
 
     def add(self, obj):
-        super(TBag, self).add(obj)
-        self.stats['count'] += obj.count
+        self._objs.append(obj)
+        self.count += obj.count
 
     def set_pattern(self, pattern):
         for obj in self:
@@ -36,9 +108,11 @@ class TBag(Bag):
 
 class TBucket(TBag):
 
+    __slots__ = ()
+
     def __init__(self):
-        super(TBucket, self).__init__()
         self._objs = {}
+        self.count = 0
 
     def __getitem__(self, key):
         return self._objs[key]
@@ -57,32 +131,62 @@ class PieceBag(TBag):
     """A bag contain all of the nodes with same piece.
 
     The nodes should on the same branch of a tree at the same level.
+    The parrent nodes and the sum of their counts are maintained when
+    adding. Most bags have only one parrent node, the set of the
+    parrent nodes is created when the second one is added.
     """
 
-    __slots__ = ('_p_nodes',)
+    __slots__ = ('_p_nodes', 'p_nodes_count', 'uniq_p_nodes_count')
 
     def __init__(self):
         super(PieceBag, self).__init__()
-        self._p_nodes = set()
+        self._p_nodes = None
+        self.p_nodes_count = 0
+        self.uniq_p_nodes_count = 0
 
     def add(self, piece_pattern_node):
         super(PieceBag, self).add(piece_pattern_node)
-        self._p_nodes.add(piece_pattern_node.parrent)
-        self.stats['p_nodes_count'] += piece_pattern_node.parrent.count \
-            if piece_pattern_node.parrent is not None \
-            else piece_pattern_node.count
+        p_node = piece_pattern_node.parrent
+        if p_node is None:
+            self.p_nodes_count += piece_pattern_node.count
+            return
+        self.p_nodes_count += p_node.count
+        p_nodes = self._p_nodes
+        if p_nodes is None:
+            self._p_nodes = p_node
+        elif isinstance(p_nodes, set):
+            if p_node in p_nodes:
+                return
+            p_nodes.add(p_node)
+        elif p_nodes is not p_node:
+            self._p_nodes = set((p_nodes, p_node))
+        else:
+            return
+        self.uniq_p_nodes_count += p_node.count
 
     @property
     def p_nodes(self):
-        return self._p_nodes
+        p_nodes = self._p_nodes
+        if p_nodes is None:
+            return ()
+        elif isinstance(p_nodes, set):
+            return p_nodes
+        return (p_nodes,)
 
 
 class PieceBagBucket(TBucket):
-    __slots__ = ('_p_nodes',)
+    """A bucket of piece bags.
+
+    The union of the parrent nodes of the piece bags and the sum of
+    their counts are made once when required.
+    """
+
+    __slots__ = ('_p_nodes', '_uniq_p_nodes_count')
 
     def __init__(self):
         super(PieceBagBucket, self).__init__()
-        self._p_nodes = set()
+        self._p_nodes = None
+        self._uniq_p_nodes_count = 0
 
     def add(self, obj):
         if isinstance(obj, PiecePatternNode):
@@ -98,15 +202,32 @@ class PieceBagBucket(TBucket):
         else:
             raise ValueError('not PiecePatternNode nor PieceBag')
 
-        self.stats['count'] += obj.count
+        self.count += obj.count
+        self._p_nodes = None
+
+    def _union_p_nodes(self):
+        p_nodes = set()
+        p_nodes_count = 0
+        for piece_bag in self:
+            for p_node in piece_bag.p_nodes:
+                if p_node not in p_nodes:
+                    p_nodes.add(p_node)
+                    p_nodes_count += p_node.count
+        self._p_nodes = p_nodes
+        self._uniq_p_nodes_count = p_nodes_count
 
     @property
     def p_nodes(self):
-        if not self._p_nodes:
-            for piece_bag in self:
-                self._p_nodes.update(piece_bag.p_nodes)
+        if self._p_nodes is None:
+            self._union_p_nodes()
         return self._p_nodes
 
+    @property
+    def uniq_p_nodes_count(self):
+        if self._p_nodes is None:
+            self._union_p_nodes()
+        return self._uniq_p_nodes_count
+
 
 class ViewPieceBag(namedtuple('ViewPieceBag', ['view', 'piece_bag'])):
     __slots__ = ()
@@ -126,7 +247,7 @@ class ViewPieceBagBucket(PieceBagBucket):
     def add(self, view_piece_bag, build_tree=True):
         piece_bag = view_piece_bag.piece_bag
         self._objs[piece_bag.pick().piece] = view_piece_bag
-        self.stats['count'] += piece_bag.count
+        self.count += piece_bag.count
 
         if not build_tree:
             return
@@ -152,6 +273,43 @@ class ViewPieceBagBucket(PieceBagBucket):
         return bucket, pattern
 
 
+class ClusterBudget(object):
+    """Budget of the cluster procedure.
+
+    Raise ClusterBudgetExceededException when the wall time or the
+    number of the visited nodes exceeds.
+
+    Args:
+        seconds (float, optional): Defaults to 0. Max wall time,
+            0 means unlimited.
+        visits (int, optional): Defaults to 0. Max number of visited
+            nodes, 0 means unlimited.
+    """
+
+    __slots__ = ('_deadline', '_max_visits', 'visits')
+
+    def __init__(self, seconds=0, visits=0):
+        self._deadline = time.time() + seconds if seconds > 0 else 0
+        self._max_visits = visits
+        self.visits = 0
+
+    def consume(self, visits=0):
+        """Consume the budget.
+
+        Args:
+            visits (int, optional): Defaults to 0. Number of visited nodes.
+
+        Raises:
+            ClusterBudgetExceededException: The budget exceeds.
+        """
+        self.visits += visits
+        if 0 < self._max_visits < self.visits:
+            raise ClusterBudgetExceededException(
+                'Exceed max visits %d' % self._max_visits)
+        if self._deadline and time.time() > self._deadline:
+            raise ClusterBudgetExceededException('Exceed max seconds')
+
+
 def confused(total, max_part, threshold):
     """Determine whether it is too complex to become a cluster.
 
@@ -190,6 +348,7 @@ class PatternCluster(object):
         self._min_cluster_num = processor.config.getint(
             'make', 'min_cluster_num')
         self._patterns = set()
+        self._num_added = 0
 
     @property
     def pre_level_processor(self):
@@ -205,6 +364,10 @@ class PatternCluster(object):
     def pattern_num(self):
         return len(self._patterns)
 
+    @property
+    def num_added(self):
+        return self._num_added
+
     def seek_cluster(self, package):
         return SeekResult.UNKNOW
 
@@ -216,7 +379,7 @@ class PiecePatternCluster(PatternCluster):
         self._bucket = PieceBagBucket()
 
     def seek_cluster(self, package):
-        p_nodes_count = sum([p.count for p in package.p_nodes])
+        p_nodes_count = package.uniq_p_nodes_count
         if p_nodes_count - package.count >= self._min_cluster_num:
             return SeekResult.IMPOSSIBLE
 
@@ -227,6 +390,7 @@ class PiecePatternCluster(PatternCluster):
 
     def add(self, piece_pattern_node):
         self._bucket.add(piece_pattern_node)
+        self._num_added += 1
 
     def _set_pattern(self, piece_bag, update_patterns=False):
         pattern = Pattern(piece_bag.pick().piece)
@@ -254,10 +418,9 @@ class PiecePatternCluster(PatternCluster):
                 return
 
         for piece_bag in self._bucket:
-            stats = piece_bag.stats
             count = piece_bag.count
             if count < mcn \
-                    or stats['p_nodes_count'] - count >= mcn \
+                    or piece_bag.p_nodes_count - count >= mcn \
                     or not self.pre_level_processor.seek_cluster(piece_bag):
                 self._set_pattern(piece_bag)
                 self._add_to_forward_cluster(piece_bag)
@@ -270,17 +433,18 @@ class PiecePatternCluster(PatternCluster):
             self._processor.get_cluster(LengthPatternCluster).add(piece_bag)
             return
 
-        view = MultiView(parsed_piece)
+        views = self._processor.views
+        view = views.get(MultiView, parsed_piece)
         p_cls = BasePatternCluster
         vl = len(view.parsed_pieces)
 
         if vl == 3 and self._processor.is_last_path():
-            ldsf_view = LastDotSplitFuzzyView(parsed_piece)
+            ldsf_view = views.get(LastDotSplitFuzzyView, parsed_piece)
             if view == ldsf_view:
                 view = ldsf_view
                 p_cls = LastDotSplitFuzzyPatternCluster
         elif vl > 3:
-            mixed_view = MixedView(parsed_piece)
+            mixed_view = views.get(MixedView, parsed_piece)
             mvl = len(mixed_view.parsed_pieces)
             if mvl == 1:
                 self._processor.get_cluster(
@@ -288,7 +452,7 @@ class PiecePatternCluster(PatternCluster):
                 return
             elif vl - mvl >= self._min_cluster_num:
                 if mvl == 3 and self._processor.is_last_path():
-                    ldsf_view = LastDotSplitFuzzyView(parsed_piece)
+                    ldsf_view = views.get(LastDotSplitFuzzyView, parsed_piece)
                     if mixed_view == ldsf_view:
                         view = ldsf_view
                         p_cls = LastDotSplitFuzzyPatternCluster
@@ -313,6 +477,7 @@ class LengthPatternCluster(PatternCluster):
         if piece_length not in self._length_buckets:
             self._length_buckets[piece_length] = PieceBagBucket()
         self._length_buckets[piece_length].add(piece_bag)
+        self._num_added += 1
 
     def _length_as_cluster(self, length_bucket):
         if len(length_bucket) < self._min_cluster_num:
@@ -380,7 +545,10 @@ class MultiPatternCluster(PatternCluster):
                     self._to_forward_cluster(b)
 
     def _cluster(self, bucket):
-        for b, pattern in bucket.cluster(self._processor.config):
+        for b, pattern in bucket.cluster(self._processor.config,
+                                         stats=self._processor.stats,
+                                         budget=self._processor.budget,
+                                         views=self._processor.views):
             yield b, pattern
 
     def _to_forward_cluster(self, bucket):
@@ -405,6 +573,7 @@ class MultiPatternCluster(PatternCluster):
             url_meta = URLMeta(len(view.parsed_pieces), [], False)
             self._buckets[view] = ViewPieceBagBucket(url_meta)
         self._buckets[view].add(view_piece_bag)
+        self._num_added += 1
 
 
 class BasePatternCluster(MultiPatternCluster):
@@ -413,15 +582,16 @@ class BasePatternCluster(MultiPatternCluster):
         view = view_piece_bag.view
         piece_bag = view_piece_bag.piece_bag
         parsed_piece = piece_bag.pick().parsed_piece
+        views = self._processor.views
 
-        mixed_view = MixedView(parsed_piece)
+        mixed_view = views.get(MixedView, parsed_piece)
         mvl = len(mixed_view.parsed_pieces)
 
         p_cls = MixedPatternCluster
 
         if view == mixed_view:
             if self._processor.is_last_path():
-                ldsf_view = LastDotSplitFuzzyView(parsed_piece)
+                ldsf_view = views.get(LastDotSplitFuzzyView, parsed_piece)
                 if len(ldsf_view.parsed_pieces) == 1:
                     self._processor.get_cluster(
                         LengthPatternCluster).add(piece_bag)
@@ -440,7 +610,7 @@ class BasePatternCluster(MultiPatternCluster):
                     LengthPatternCluster).add(piece_bag)
                 return
             elif mvl == 3 and self._processor.is_last_path():
-                ldsf_view = LastDotSplitFuzzyView(parsed_piece)
+                ldsf_view = views.get(LastDotSplitFuzzyView, parsed_piece)
                 if mixed_view == ldsf_view:
                     view = ldsf_view
                     p_cls = LastDotSplitFuzzyPatternCluster
@@ -457,7 +627,8 @@ class MixedPatternCluster(MultiPatternCluster):
         parsed_piece = piece_bag.pick().parsed_piece
 
         if self._processor.is_last_path():
-            ldsf_view = LastDotSplitFuzzyView(parsed_piece)
+            ldsf_view = self._processor.views.get(
+                LastDotSplitFuzzyView, parsed_piece)
             if len(ldsf_view.parsed_pieces) == 1:
                 self._processor.get_cluster(
                     LengthPatternCluster).add(piece_bag)
@@ -478,7 +649,10 @@ class LastDotSplitFuzzyPatternCluster(MultiPatternCluster):
 
     def _cluster(self, bucket):
         for b, pattern in bucket.cluster(self._processor.config,
-                                         last_path_as_pattern=True):
+                                         last_path_as_pattern=True,
+                                         stats=self._processor.stats,
+                                         budget=self._processor.budget,
+                                         views=self._processor.views):
             yield b, pattern
 
     def _add_to_forward_cluster(self, view_piece_bag):
@@ -494,6 +668,7 @@ class FuzzyPatternCluster(PatternCluster):
         self._fuzzy_pattern = None
 
     def add(self, bucket):
+        self._num_added += 1
         if self._force_pattern:
             self._set_pattern(bucket)
         else:
@@ -543,7 +718,13 @@ class ClusterProcessor(object):
             [(c.__name__, c(self)) for c in CLUSTER_CLASSES])
         self._pre_level_processor = pre_level_processor
         self._next_level_processors = {}
+        self._backward_packages = {}
+        if kwargs.get('views', None) is None:
+            kwargs['views'] = ViewCache()
         self._kwargs = kwargs
+        self._stats = kwargs.get('stats', None)
+        self._budget = kwargs.get('budget', None)
+        self._views = kwargs['views']
 
     @cached_property
     def level(self):
@@ -564,16 +745,32 @@ class ClusterProcessor(object):
     def kwargs(self):
         return self._kwargs
 
+    @property
+    def stats(self):
+        return self._stats
+
+    @property
+    def budget(self):
+        return self._budget
+
+    @property
+    def views(self):
+        return self._views
+
     @property
     def next_level_processors(self):
         return self._next_level_processors.values()
 
     def _backward_package(self, package):
+        bucket = self._backward_packages.get(package, None)
+        if bucket is not None:
+            return bucket
         bucket = PieceBagBucket()
         for p_node in package.p_nodes:
             if p_node.piece in bucket:
                 continue
             bucket.add(p_node)
+        self._backward_packages[package] = bucket
         return bucket
 
     def seek_cluster(self, package):
@@ -607,8 +804,20 @@ class ClusterProcessor(object):
         return self._pre_level_processor
 
     def _process(self):
-        for c in itervalues(self._pattern_clusters):
+        stats = self._stats
+        if stats is None:
+            for c in itervalues(self._pattern_clusters):
+                c.cluster()
+            return
+
+        level_started = stats.start()
+        num_added = 0
+        for name, c in iteritems(self._pattern_clusters):
+            started = stats.start()
             c.cluster()
+            stats.stop('cluster', name, started, c.num_added)
+            num_added += c.num_added
+        stats.stop('level', str(self.level), level_started, num_added)
 
     def add(self, node, add_children=False):
         c = self.get_cluster(PiecePatternCluster)
@@ -623,6 +832,9 @@ class ClusterProcessor(object):
         return sum([c.pattern_num for c in itervalues(self._pattern_clusters)])
 
     def process(self):
+        if self._budget is not None:
+            self._budget.consume(
+                self.get_cluster(PiecePatternCluster).num_added)
         self._process()
         if self.is_last_level():
             return
@@ -648,24 +860,101 @@ class ClusterProcessor(object):
             processor.add(node, add_children=True)
 
 
-def split_by_pattern(root):
+def _path_groups(root):
+    """Get the pattern path group of each node.
+
+    The pattern paths are interned as int ids. The group of a node is
+    the id of the pattern path if all of the leaves under it have the
+    same pattern path, otherwise a frozenset of the ids.
+    """
+    path_ids = {}
+    groups = {}
+    nodes = [root]
+    stack = [(child, -1) for child in root.children]
+    while stack:
+        node, parrent_id = stack.pop()
+        key = (parrent_id, node.pattern)
+        path_id = path_ids.get(key, None)
+        if path_id is None:
+            path_id = path_ids[key] = len(path_ids)
+        if node.leaf():
+            groups[node] = path_id
+        else:
+            nodes.append(node)
+            stack.extend([(child, path_id) for child in node.children])
+
+    for node in reversed(nodes):
+        group = None
+        merged = None
+        for child in node.children:
+            g = groups[child]
+            if merged is not None:
+                if isinstance(g, frozenset):
+                    merged.update(g)
+                else:
+                    merged.add(g)
+            elif group is None:
+                group = g
+            elif group != g:
+                merged = set(group) if isinstance(group, frozenset) \
+                    else set((group,))
+                if isinstance(g, frozenset):
+                    merged.update(g)
+                else:
+                    merged.add(g)
+        groups[node] = group if merged is None else frozenset(merged)
+    return groups
+
+
+def split_by_pattern(root, inplace=False):
     """Split the piece pattern tree by pattern path.
 
+    The leaves with the same pattern path are put into the same
+    sub-tree. The sub-trees which contain only one pattern path are
+    attached to the new trees directly if inplace=True, otherwise
+    copied. Only the upper nodes shared by several pattern paths are
+    created for each new tree.
+
     Args:
         root (PiecePatternNode): The root of piece pattern tree.
+        inplace (bool, optional): Defaults to False. Whether reuse the
+            nodes, the tree can not be used any more after splitting.
 
     Returns:
-        iterator: Iterator of sub-trees.
+        list: The sub-trees, in the order of the first leaf of each
+            pattern path.
     """
-    tree_roots = {}
-    for nodes in dump_tree(root):
-        pid = hash("/".join([str(p.pattern) for p in nodes]))
-        if pid not in tree_roots:
-            tree_roots[pid] = PiecePatternNode((EMPTY_PARSED_PIECE, None))
-        sub_root = tree_roots[pid]
-        build_from_piece_pattern_nodes(sub_root, nodes[1:])
+    groups = _path_groups(root)
+    root_group = groups[root]
+    if root_group is None:
+        return []
+    if not isinstance(root_group, frozenset):
+        root_group = (root_group,)
+    tree_roots = dict([(g, PiecePatternNode((EMPTY_PARSED_PIECE, None)))
+                       for g in root_group])
+    ordered = OrderedDict()
+    stack = [(child, tree_roots) for child in reversed(list(root.children))]
+    while stack:
+        node, parrents = stack.pop()
+        group = groups[node]
+        if not isinstance(group, frozenset):
+            parrent = parrents[group]
+            if inplace:
+                parrent.attach_child(node.piece, node)
+            else:
+                copy_piece_pattern_tree(node, parrent)
+            parrent.incr_count(node.count, True)
+            if group not in ordered:
+                ordered[group] = tree_roots[group]
+            continue
+        copies = {}
+        for g in group:
+            copies[g], _ = parrents[g].add_child(
+                (node.piece, (node.parsed_piece, node.pattern)))
+        stack.extend([(child, copies)
+                      for child in reversed(list(node.children))])
 
-    return itervalues(tree_roots)
+    return list(itervalues(ordered))
 
 
 def _can_be_splited(processor):
@@ -705,7 +994,13 @@ def process(config, url_meta, root, **kwargs):
     """
     processor = ClusterProcessor(config, url_meta, None, **kwargs)
     processor.add(root)
-    processor.process()
+    stats = processor.stats
+    if stats is None:
+        processor.process()
+    else:
+        started = stats.start()
+        processor.process()
+        stats.stop('process', 'process', started, root.count)
     return _can_be_splited(processor)
 
 
@@ -717,16 +1012,40 @@ def cluster(config, url_meta, root, **kwargs):
         url_meta (URLMeta): The URLMeta object.
         root (PiecePatternNode): The root of the piece pattern tree.
         **kwargs: Keyword arguments.
+            stats (ClusterStats): Record the statistics if specified.
+            budget (ClusterBudget): Check the budget if specified.
+            views (ViewCache): The parsed piece views cache shared by
+                all of the recursions, created if not specified.
+
+    Raises:
+        ClusterBudgetExceededException: The budget exceeds.
 
     Yields:
         PiecePatternNode: The clustered sub piece pattern tree root.
 
     """
+    if kwargs.get('views', None) is None:
+        kwargs['views'] = ViewCache()
+    return _cluster(config, url_meta, root, False, kwargs)
+
+
+def _cluster(config, url_meta, root, inplace, kwargs):
     if root.count <= 0:
         return
     if not process(config, url_meta, root, **kwargs):
         yield root
         return
-    for sub_root in split_by_pattern(root):
-        for clustered in cluster(config, url_meta, sub_root, **kwargs):
+    budget = kwargs.get('budget', None)
+    if budget is not None:
+        budget.consume()
+    stats = kwargs.get('stats', None)
+    if stats is not None:
+        started = stats.start()
+        sub_roots = split_by_pattern(root, inplace)
+        stats.stop('split', 'split_by_pattern', started, len(sub_roots))
+    else:
+        sub_roots = split_by_pattern(root, inplace)
+    # the sub-trees are created by splitting, they can be split in place
+    for sub_root in sub_roots:
+        for clustered in _cluster(config, url_meta, sub_root, True, kwargs):
             yield clustered
@@ -1,13 +1,130 @@
 """Pattern clustering procedure APIs.
 """
-from .compat import itervalues
+import hashlib
+import logging
+import os
+import random
+import time
+from collections import OrderedDict
+
+from .compat import iteritems, itervalues, pickle
 from .config import get_default_config
 from .definition import BasePattern
-from .parse_utils import EMPTY_PARSED_PIECE, ParsedPiece
+from .exceptions import ClusterBudgetExceededException
+from .parse_utils import (EMPTY_PARSED_PIECE, ParsedPiece, URLMeta,
+                          analyze_url_pattern_string, parse_pattern_piece,
+                          wildcard_rule)
 from .parser import fuzzy_digest, parse
-from .pattern_cluster import cluster
-from .piece_pattern_node import PiecePatternNode, build_from_parsed_pieces
-from .utils import TreeNode, build_tree, dump_tree, pick
+from .pattern import Pattern
+from .pattern_cluster import ClusterBudget, ClusterStats, cluster
+from .piece_pattern_node import (PiecePatternNode, TruncatedPiecePatternNode,
+                                 build_from_parsed_pieces,
+                                 build_from_piece_pattern_nodes,
+                                 dump_piece_pattern_tree,
+                                 find_from_parsed_pieces,
+                                 load_piece_pattern_tree, remove_from_tree)
+from .utils import (FingerprintSet, TreeNode, build_tree, dump_tree,
+                    iter_leaves, pick)
+
+SNAPSHOT_VERSION = 4
+
+_logger = logging.getLogger(__name__)
+
+
+def _config_items(config):
+    return sorted(config.items('make'))
+
+
+def _path_fingerprint(parsed_pieces):
+    return FingerprintSet.fingerprint(
+        '\t'.join([p.piece for p in parsed_pieces]))
+
+
+def _dump_clustered(clustered):
+    """Dump a clustered tree into a compact record.
+
+    The record is a 4-tuple, (pattern_strings, count, meta, truncated).
+    The pattern strings are of the first path, the meta data of all the
+    leaves are merged.
+    """
+    nodes = pick(dump_tree(clustered))
+    merged = PiecePatternNode((EMPTY_PARSED_PIECE, None))
+    for leaf in iter_leaves(clustered):
+        merged.update_meta(leaf.meta)
+    return (tuple([n.pattern.pattern_string for n in nodes[1:]]),
+            clustered.count, merged.meta, clustered.truncated)
+
+
+def _load_clustered(record):
+    """Load a single path clustered tree from the compact record."""
+    pattern_strings, count, meta, truncated = record
+    node_cls = TruncatedPiecePatternNode if truncated else PiecePatternNode
+    root = node = node_cls((EMPTY_PARSED_PIECE, None))
+    root.count = count
+    for pattern_string in pattern_strings:
+        node, _ = node.add_child(
+            (pattern_string, (EMPTY_PARSED_PIECE, Pattern(pattern_string))))
+        node.count = count
+    node.meta = meta
+    return root
+
+
+class ClusterCache(object):
+    """File system cache of the clustered results.
+
+    Each entry is a pickle file named by the fingerprint of a Maker,
+    so unchanged Makers can skip clustering across runs. A clustered
+    tree is stored as the pattern path with the count and the merged
+    meta data. Meta data must be picklable.
+
+    Args:
+        cache_dir (str): The cache directory, created if not exists.
+    """
+
+    def __init__(self, cache_dir):
+        if not os.path.isdir(cache_dir):
+            os.makedirs(cache_dir)
+        self._cache_dir = cache_dir
+        self.hits = 0
+        self.misses = 0
+
+    def _path(self, fingerprint):
+        return os.path.join(self._cache_dir, fingerprint + '.pickle')
+
+    def get(self, fingerprint):
+        """Get the cached clustered results.
+
+        Args:
+            fingerprint (str): The fingerprint of a Maker.
+
+        Returns:
+            list: The clustered roots, None if not cached.
+        """
+        try:
+            with open(self._path(fingerprint), 'rb') as f:
+                clustered_list = [_load_clustered(r)
+                                  for r in pickle.load(f)]
+        except (IOError, OSError, EOFError, ValueError, TypeError,
+                pickle.UnpicklingError) as e:
+            if os.path.exists(self._path(fingerprint)):
+                _logger.warning('Invalid cache %s, %s', fingerprint, str(e))
+            self.misses += 1
+            return None
+        self.hits += 1
+        return clustered_list
+
+    def put(self, fingerprint, clustered_list):
+        """Cache the clustered results.
+
+        Args:
+            fingerprint (str): The fingerprint of a Maker.
+            clustered_list (list): The clustered roots.
+        """
+        path = self._path(fingerprint)
+        tmp = '%s.%d.tmp' % (path, os.getpid())
+        with open(tmp, 'wb') as f:
+            pickle.dump([_dump_clustered(c) for c in clustered_list], f, 2)
+        os.rename(tmp, path)
 
 
 class PatternMaker(object):
@@ -15,18 +132,51 @@ class PatternMaker(object):
 
     After load urls, iterate all sub makers make cluster
     individually or cluster all by calling make method.
+
+    With incremental=True, each sub maker keeps its clustered
+    result and only the sub makers which loaded new urls since
+    last make will be clustered again. The state can be saved
+    and restored across runs.
+
+    With collect_stats=True, the statistics of the cluster procedure
+    of all sub makers are recorded, get them by calling stats method.
+
+    With cache_dir, the clustered results are cached by the fingerprint
+    of each sub maker, clustering is skipped if it is cached.
+
+    With dedupe=True, the fingerprints of the loaded urls paired with
+    the meta data are kept in a compact set, a duplicated url with the
+    same meta data is skipped before parsing when loaded with uniq=True.
+    A duplicated url with new meta data is parsed to attach the meta
+    data, the count is not added.
     """
 
-    def __init__(self, config=None):
+    def __init__(self, config=None, incremental=False, collect_stats=False,
+                 cache_dir=None, dedupe=False):
         self._config = get_default_config() if config is None else config
+        self._incremental = incremental
         self._makers = {}
+        self._stats = ClusterStats() if collect_stats else None
+        self._cache = ClusterCache(cache_dir) if cache_dir else None
+        self._fingerprints = FingerprintSet() if dedupe else None
+        self._duplicates = 0
+
+    @property
+    def cache(self):
+        """ClusterCache: The cache of the clustered results."""
+        return self._cache
 
     @property
     def makers(self):
         """iterable: For iterating all sub makers."""
         return itervalues(self._makers)
 
-    def load(self, url, meta=None):
+    @property
+    def duplicates(self):
+        """int: Number of the duplicated urls skipped by dedupe."""
+        return self._duplicates
+
+    def load(self, url, meta=None, count=1, uniq=True):
         """Load url and meta.
 
         Args:
@@ -34,17 +184,98 @@ class PatternMaker(object):
             meta (object, optional): Defaults to None. Meta data will be
                 merged at each cluster and can be accessed by clustered
                 node's meta property.
+            count (int, optional): Defaults to 1. The weight of the url.
+            uniq (bool, optional): Defaults to True. The count of a
+                duplicated url will not be added.
 
         Returns:
-            tuple: 2-tules, (node, is_new).
+            tuple: 2-tules, (node, is_new). The node is None if the url
+                is skipped by dedupe.
         """
+        fp = None
+        if uniq and self._fingerprints is not None:
+            fp = FingerprintSet.fingerprint(
+                url if meta is None else '\t'.join((url, repr(meta))))
+            if fp in self._fingerprints:
+                self._duplicates += 1
+                return None, False
         url_meta, parsed_pieces = parse(url)
         if not isinstance(parsed_pieces[0], ParsedPiece):
             raise ValueError('Invalid URL')
+        result = self._load(url_meta, parsed_pieces, meta, count, uniq)
+        if fp is not None:
+            self._fingerprints.add(fp)
+        return result
+
+    def load_pattern(self, url_pattern_string, meta=None, count=1):
+        """Load URL pattern string and meta.
+
+        The pattern units are treated as sub-pieces, so the URL patterns
+        can be clustered again into consolidated patterns, such as the
+        patterns clustered from different shards.
+
+        Args:
+            url_pattern_string (str): The URL pattern string.
+            meta (object, optional): Defaults to None. Meta data will be
+                merged at each cluster and can be accessed by clustered
+                node's meta property.
+            count (int, optional): Defaults to 1. The count of the URLs
+                matched the pattern.
+
+        Returns:
+            tuple: 2-tules, (node, is_new).
+        """
+        url_meta, pattern_strings = analyze_url_pattern_string(
+            url_pattern_string)
+        parsed_pieces = tuple([parse_pattern_piece(p)
+                               for p in pattern_strings])
+        return self._load(url_meta, parsed_pieces, meta, count, False)
+
+    def _load(self, url_meta, parsed_pieces, meta, count, uniq):
         sid = fuzzy_digest(url_meta, parsed_pieces)
         if sid not in self._makers:
-            self._makers[sid] = Maker(url_meta, self._config)
-        return self._makers[sid].load(parsed_pieces, meta=meta)
+            self._makers[sid] = self._create_maker(url_meta)
+        return self._makers[sid].load(parsed_pieces, meta=meta,
+                                      count=count, uniq=uniq)
+
+    def merge(self, other, uniq=False):
+        """Merge the loaded urls of other PatternMaker.
+
+        The sub makers with the same fuzzy digest are merged, see
+        Maker.merge. Used for merging the shards loaded in parallel,
+        the partial state of a shard can be saved and restored with
+        save and restore. The other PatternMaker should not be used
+        after merging.
+
+        Args:
+            other (PatternMaker): The other PatternMaker.
+            uniq (bool, optional): Defaults to False. The count of the
+                duplicated urls will not be added.
+        """
+        for sid, maker in iteritems(other._makers):
+            if sid not in self._makers:
+                self._makers[sid] = self._create_maker(maker.url_meta)
+            self._makers[sid].merge(maker, uniq)
+
+    def absorb(self):
+        """Fold the loaded patterns into the wider ones, see Maker.absorb.
+
+        Returns:
+            int: Number of the absorbed patterns.
+        """
+        return sum([maker.absorb() for maker in itervalues(self._makers)])
+
+    def stats(self):
+        """Get the statistics of the cluster procedure.
+
+        Returns:
+            ClusterStats: The statistics, None if not collected.
+        """
+        return self._stats
+
+    def _create_maker(self, url_meta):
+        return Maker(url_meta, self._config, self._incremental,
+                     stats=self._stats, cache=self._cache)
 
     def make(self, combine=False):
         """Iterate all sub makers, start clustering and yield clustered.
@@ -61,24 +292,394 @@ class PatternMaker(object):
             for clustered in maker.make(combine):
                 yield maker.url_meta, clustered
 
+    def save(self, fileobj):
+        """Save the state into a snapshot file.
+
+        The loaded piece trees and the clustered results of the
+        sub makers which are not changed since last make are saved.
+        Meta data must be picklable.
+
+        Args:
+            fileobj (file): Binary file object to write.
+        """
+        state = {
+            'version': SNAPSHOT_VERSION,
+            'config': _config_items(self._config),
+            'makers': [(sid, maker.get_state())
+                       for sid, maker in iteritems(self._makers)],
+        }
+        pickle.dump(state, fileobj, 2)
+
+    @classmethod
+    def restore(cls, fileobj, config=None, collect_stats=False,
+                cache_dir=None, dedupe=False):
+        """Restore an incremental PatternMaker from a snapshot file.
+
+        The clustered results are dropped if the snapshot was made
+        with different make configure.
+
+        Args:
+            fileobj (file): Binary file object to read.
+            config (Config, optional): Defaults to None. The configure.
+            collect_stats (bool, optional): Defaults to False. Whether
+                record the statistics of the cluster procedure.
+            cache_dir (str, optional): Defaults to None. The directory of
+                the clustered results cache.
+            dedupe (bool, optional): Defaults to False. Whether skip the
+                duplicated urls before parsing.
+
+        Raises:
+            ValueError: Unsupported snapshot.
+
+        Returns:
+            PatternMaker: The restored PatternMaker.
+        """
+        state = pickle.load(fileobj)
+        if state.get('version') != SNAPSHOT_VERSION:
+            raise ValueError('Unsupported snapshot version %r' %
+                             state.get('version'))
+        pattern_maker = cls(config, incremental=True,
+                            collect_stats=collect_stats,
+                            cache_dir=cache_dir,
+                            dedupe=dedupe)
+        keep_clustered = state['config'] == _config_items(
+            pattern_maker._config)
+        for sid, maker_state in state['makers']:
+            pattern_maker._makers[sid] = Maker.from_state(
+                maker_state, pattern_maker._config, keep_clustered,
+                pattern_maker._stats, pattern_maker._cache)
+        return pattern_maker
+
+
+class StreamPatternMaker(PatternMaker):
+    """Online clustering for unbounded URL stream.
+
+    Each sub maker keeps at most max_urls_per_maker sampled urls
+    (default: the configured value or 10000 if not configured) and
+    at most max_makers sub makers are kept, the least recently loaded
+    one is dropped. So the memory usage is bounded no matter how many
+    urls are loaded. The distinct urls are not tracked, the duplicated
+    urls which are not sampled are counted as hits.
+
+    The clustered results should be emitted every emit_every urls or
+    emit_interval seconds, check with should_emit.
+    """
+
+    def __init__(self, config=None, max_urls_per_maker=None,
+                 max_makers=10000, emit_every=0, emit_interval=0,
+                 collect_stats=False):
+        super(StreamPatternMaker, self).__init__(
+            config, incremental=True, collect_stats=collect_stats)
+        self._makers = OrderedDict()
+        if max_urls_per_maker is None:
+            max_urls_per_maker = self._config.getint(
+                'make', 'max_urls_per_maker') or 10000
+        self._max_urls_per_maker = max_urls_per_maker
+        self._max_makers = max_makers
+        self._emit_every = emit_every
+        self._emit_interval = emit_interval
+        self._loaded = 0
+        self._last_emit_time = time.time()
+
+    def _create_maker(self, url_meta):
+        return Maker(url_meta, self._config, True, self._max_urls_per_maker,
+                     stats=self._stats, distinct=False)
+
+    def load(self, url, meta=None, count=1, uniq=True):
+        """Load url and meta.
+
+        Args:
+            url (str): The URL to be loaded.
+            meta (object, optional): Defaults to None. Meta data will be
+                merged at each cluster and can be accessed by clustered
+                node's meta property.
+            count (int, optional): Defaults to 1. The weight of the url.
+            uniq (bool, optional): Defaults to True. The count of a
+                duplicated url will not be added.
+
+        Returns:
+            tuple: 2-tules, (node, is_new). The node is None if the url
+                is not sampled.
+        """
+        url_meta, parsed_pieces = parse(url)
+        if not isinstance(parsed_pieces[0], ParsedPiece):
+            raise ValueError('Invalid URL')
+        sid = fuzzy_digest(url_meta, parsed_pieces)
+        maker = self._makers.pop(sid, None)
+        if maker is None:
+            maker = self._create_maker(url_meta)
+            if self._max_makers > 0 and len(self._makers) >= self._max_makers:
+                self._makers.popitem(last=False)
+        self._makers[sid] = maker
+        self._loaded += 1
+        return maker.load(parsed_pieces, meta=meta, count=count, uniq=uniq)
+
+    @property
+    def pending(self):
+        """int: Number of loaded urls since last emit."""
+        return self._loaded
+
+    def should_emit(self):
+        """Whether the clustered results should be emitted.
+
+        Returns:
+            bool: True if emit_every urls are loaded or emit_interval
+                seconds passed since last emit.
+        """
+        if self._loaded <= 0:
+            return False
+        if self._emit_every > 0 and self._loaded >= self._emit_every:
+            return True
+        if self._emit_interval > 0 \
+                and time.time() - self._last_emit_time >= self._emit_interval:
+            return True
+        return False
+
+    def emit(self, combine=False):
+        """Cluster and get the current clustered results.
+
+        The clustered trees may be modified by further loading,
+        process them before loading again.
+
+        Args:
+            combine (bool, optional): Defaults to False. Combine the
+                same url_meta clusters into a patten tree.
+
+        Returns:
+            list: List of 2-tuple, (url_meta, clustered).
+        """
+        self._loaded = 0
+        self._last_emit_time = time.time()
+        return list(self.make(combine))
+
+    def stream(self, urls, combine=False):
+        """Load urls from an iterable and yield when should emit.
+
+        Args:
+            urls (iterable): The URLs to be loaded.
+            combine (bool, optional): Defaults to False. Combine the
+                same url_meta clusters into a patten tree.
+
+        Yields:
+            list: List of 2-tuple, (url_meta, clustered).
+        """
+        for url in urls:
+            self.load(url)
+            if self.should_emit():
+                yield self.emit(combine)
+        if self.pending > 0:
+            yield self.emit(combine)
+
+
+def _literal_runs(units):
+    """Get the leading and the trailing literal unit strings."""
+    leading = []
+    for unit in units:
+        if not unit.is_literal():
+            break
+        leading.append(unit.pattern_unit_string)
+    trailing = []
+    for unit in reversed(units):
+        if not unit.is_literal():
+            break
+        trailing.append(unit.pattern_unit_string)
+    trailing.reverse()
+    return tuple(leading), tuple(trailing)
+
+
+def _length(units):
+    nums = [unit.num for unit in units]
+    return -1 if min(nums) < 0 else sum(nums)
+
+
+def _rules(pattern):
+    return set.union(*[unit.rules for unit in pattern.pattern_units])
+
+
+def _index_wider(nodes):
+    """Index the nodes which have non-literal pattern units.
+
+    A wider pattern can only cover the patterns which start and end
+    with its leading and trailing literal units and have its length if
+    fixed, so they are the index key.
+    """
+    index = {}
+    for node in nodes:
+        units = node.pattern.pattern_units
+        if all([unit.is_literal() for unit in units]):
+            continue
+        leading, trailing = _literal_runs(units)
+        index.setdefault((leading, trailing, _length(units)), []).append(
+            (node, _rules(node.pattern)))
+    return index
+
+
+def _iter_wider(index, pattern):
+    """Iterate the indexed nodes which may cover the pattern."""
+    units = pattern.pattern_units
+    leading, trailing = _literal_runs(units)
+    length = _length(units)
+    lengths = (-1,) if length < 0 else (-1, length)
+    rules = _rules(pattern)
+    for i in range(0, len(leading) + 1):
+        for j in range(0, min(len(trailing), len(units) - i - 1) + 1):
+            for length in lengths:
+                key = (leading[:i], trailing[len(trailing) - j:], length)
+                for node, node_rules in index.get(key, ()):
+                    if rules <= node_rules:
+                        yield node
+
+
+def _absorb_into(narrow, wider):
+    """Fold the paths under narrow into the covering paths under wider."""
+    if narrow.leaf():
+        count = narrow.count
+        remove_from_tree(narrow)
+        wider.incr_count(count, True)
+        wider.update_meta(narrow.meta)
+        return 1
+    absorbed = 0
+    index = _index_wider(wider.children)
+    for child in list(narrow.children):
+        same = wider.get_child(child.piece)
+        candidates = [same] if same is not None else []
+        candidates.extend([c for c in _iter_wider(index, child.pattern)
+                           if c is not same])
+        for candidate in candidates:
+            if candidate.count > 0 \
+                    and candidate.pattern.covers(child.pattern):
+                absorbed += _absorb_into(child, candidate)
+                if child.count <= 0:
+                    break
+    return absorbed
+
 
 class Maker(object):
     """Low-level APIs for clustering.
 
     Suppose this will only be used for same fuzzy-digest clustering.
+
+    With the configured max_examples > 0, at most max_examples leaf
+    nodes under the same parent and max_examples * max_examples ones of
+    the maker keep meta data when loaded, the others keep none. Each
+    one keeps at most max_examples meta data and counts all of the
+    loaded ones.
+
+    With max_urls > 0, at most max_urls urls are kept, after that the
+    maker switches to reservoir sampling mode, weighted urls have more
+    chances to be sampled. The max_urls defaults to the configured
+    max_urls_per_maker. With distinct=True, the fingerprints of the
+    loaded urls are kept, so the duplicated urls are not counted again
+    even if they are not sampled, otherwise only the duplicated urls
+    of the sampled ones are identified and the memory usage is bounded.
+    In sampling mode, the count of each clustered root is scaled to the
+    total count.
+
+    The statistics of the cluster procedure are recorded into stats
+    if specified.
+
+    With the configured max_cluster_seconds or max_cluster_visits > 0,
+    clustering stops when the budget exceeds and a fallback tree is
+    made instead, each level of it has the fuzzy wildcard pattern, an
+    empty piece keeps the empty pattern. The nodes of the fallback tree
+    are flagged with truncated=True, only the json formatter outputs the
+    flag.
+
+    With cache, the clustered results are got from the cache by the
+    fingerprint if exist, otherwise put into the cache after clustering
+    unless truncated.
     """
 
-    def __init__(self, url_meta, config=None):
+    def __init__(self, url_meta, config=None, incremental=False, max_urls=None,
+                 stats=None, cache=None, distinct=True):
         self._url_meta = url_meta
         self._config = get_default_config() if config is None else config
         self._root = PiecePatternNode((EMPTY_PARSED_PIECE, None))
+        self._incremental = incremental
+        self._clustered = None
+        if max_urls is None:
+            max_urls = self._config.getint('make', 'max_urls_per_maker')
+        self._max_urls = max_urls
+        self._max_examples = self._config.getint('make', 'max_examples')
+        self._max_cluster_seconds = self._config.getfloat(
+            'make', 'max_cluster_seconds')
+        self._max_cluster_visits = self._config.getint(
+            'make', 'max_cluster_visits')
+        self._samples = []
+        self._seen = 0
+        self._fingerprints = FingerprintSet() \
+            if max_urls > 0 and distinct else None
+        self._size = 0
+        self._random = random.Random(0)
+        self._stats = stats
+        self._cache = cache
+        self._tree_data = None
+        self._clustered_records = None
+
+    def _load_tree(self, modify=False):
+        """Load the serialized piece tree of a restored maker.
+
+        The serialized data is kept until the tree is modified, so it
+        can be saved again without dumping.
+        """
+        if self._tree_data is None:
+            return
+        if self._root.count <= 0:
+            tree_records, seen, fingerprints = pickle.loads(self._tree_data)
+            self._root = load_piece_pattern_tree(tree_records)
+            if self._max_urls > 0:
+                self._samples = list(iter_leaves(self._root))
+                self._seen = max(seen, len(self._samples))
+                if fingerprints is not None:
+                    self._fingerprints = fingerprints
+                elif self._fingerprints is not None:
+                    for nodes in dump_tree(self._root):
+                        self._fingerprints.add(_path_fingerprint(
+                            [n.parsed_piece for n in nodes[1:]]))
+            else:
+                self._size = sum(1 for _ in iter_leaves(self._root))
+        if modify:
+            self._tree_data = None
+
+    @property
+    def dirty(self):
+        """bool: Whether need to be clustered.
+
+        Reloading a duplicated url with uniq=True and already kept meta
+        does not make the maker dirty.
+        """
+        return self._clustered is None
 
     @property
     def url_meta(self):
         """URLMeta: The URLMeta object."""
         return self._url_meta
 
-    def load(self, parsed_pieces, meta=None):
+    @property
+    def sampling(self):
+        """bool: Whether in sampling mode."""
+        self._load_tree()
+        return self._max_urls > 0 and self._seen > self._max_urls
+
+    @property
+    def total(self):
+        """int: Total count of the loaded urls.
+
+        The same as the count of the piece tree root without sampling.
+        With max_urls > 0 and distinct=True, the duplicated urls loaded
+        with uniq=True are identified by fingerprints whether they are
+        sampled or not.
+        """
+        self._load_tree()
+        return self._seen if self._max_urls > 0 else self._root.count
+
+    @property
+    def size(self):
+        """int: Number of the uniq paths of the loaded piece tree."""
+        self._load_tree()
+        return len(self._samples) if self._max_urls > 0 else self._size
+
+    def load(self, parsed_pieces, meta=None, count=1, uniq=True):
         """Load parsed pieces and meta.
 
         Args:
@@ -86,19 +687,306 @@ class Maker(object):
             meta (object, optional): Defaults to None. Meta data will be
                 merged at each cluster and can be accessed by clustered
                 node's meta property.
+            count (int, optional): Defaults to 1. The weight of the
+                parsed pieces.
+            uniq (bool, optional): Defaults to True. The count of
+                duplicated parsed pieces will not be added.
 
         Returns:
-            tuple: 2-tules, (node, is_new).
+            tuple: 2-tules, (node, is_new). The node is None if the
+                parsed pieces are not sampled.
+        """
+        self._load_tree(True)
+        if self._max_urls > 0:
+            return self._sample(parsed_pieces, meta, count, uniq)
+        node, is_new = build_from_parsed_pieces(self._root,
+                                                parsed_pieces,
+                                                count=count,
+                                                uniq=uniq)
+        meta_changed = node.add_meta(meta, self._max_examples)
+        if is_new:
+            self._size += 1
+        if is_new or meta_changed or not uniq:
+            self._clustered = None
+        return node, is_new
+
+    def merge(self, other, uniq=False):
+        """Merge the loaded piece tree of other Maker.
+
+        The smaller tree is merged into the larger one, the counts are
+        summed and the meta data are merged. It is linear in the size
+        of the smaller tree. The other Maker should not be used after
+        merging.
+
+        Args:
+            other (Maker): The Maker with the same url_meta.
+            uniq (bool, optional): Defaults to False. The count of the
+                duplicated paths will not be added.
+
+        Raises:
+            ValueError: The url_meta is different.
+        """
+        if tuple(self._url_meta) != tuple(other.url_meta):
+            raise ValueError('Can not merge different url_meta')
+        self._load_tree(True)
+        other._load_tree()
+        root = other._root
+        if other.size > self.size:
+            self._root, root = root, self._root
+            self._size = other.size
+        for nodes in dump_tree(root):
+            if len(nodes) <= 1:
+                continue
+            leaf = nodes[-1]
+            node, is_new = build_from_parsed_pieces(
+                self._root, [n.parsed_piece for n in nodes[1:]],
+                count=leaf.count, uniq=uniq)
+            node.update_meta(leaf.meta, self._max_examples)
+            if is_new:
+                self._size += 1
+        self._seen += other._seen
+        if self._fingerprints is not None \
+                and other._fingerprints is not None:
+            for fp in other._fingerprints:
+                if not self._fingerprints.add(fp) and uniq:
+                    self._seen -= 1
+        if self._max_urls > 0:
+            self._resample()
+        self._clustered = None
+
+    def absorb(self):
+        """Fold the loaded pattern paths into the wider ones.
+
+        Used after loading patterns with PatternMaker.load_pattern. A
+        path is absorbed by another path which pattern at each level
+        covers it, see Pattern.covers. The absorbed path is removed,
+        its count is added to the wider one and its meta data are
+        merged. Only the siblings are compared, each one with the
+        siblings which have non-literal pattern units, the same literal
+        affixes and length and compatible rules.
+
+        Returns:
+            int: Number of the absorbed paths.
         """
-        return build_from_parsed_pieces(self._root,
-                                        parsed_pieces,
-                                        meta=meta)
+        self._load_tree(True)
+        absorbed = 0
+        stack = [self._root]
+        while stack:
+            node = stack.pop()
+            index = _index_wider(node.children)
+            for child in list(node.children) if index else ():
+                for wider in _iter_wider(index, child.pattern):
+                    if wider is child or wider.count <= 0:
+                        continue
+                    if wider.pattern.covers(child.pattern) \
+                            and not child.pattern.covers(wider.pattern):
+                        absorbed += _absorb_into(child, wider)
+                        if child.count <= 0:
+                            break
+            stack.extend(node.children)
+        if absorbed:
+            self._size -= absorbed
+            if self._max_urls > 0:
+                self._resample()
+            self._clustered = None
+        return absorbed
+
+    def _resample(self):
+        self._samples = [leaf for leaf in iter_leaves(self._root)
+                         if leaf is not self._root]
+        self._seen = max(self._seen, len(self._samples))
+        while len(self._samples) > self._max_urls:
+            idx = self._random.randrange(len(self._samples))
+            self._samples[idx], self._samples[-1] = \
+                self._samples[-1], self._samples[idx]
+            remove_from_tree(self._samples.pop())
+
+    def _sample(self, parsed_pieces, meta, count, uniq):
+        node = find_from_parsed_pieces(self._root, parsed_pieces)
+        if node is not None:
+            if not uniq:
+                self._seen += count
+                node.incr_count(count, True)
+                self._clustered = None
+            if node.add_meta(meta, self._max_examples):
+                self._clustered = None
+            return node, False
+
+        if uniq and self._fingerprints is not None \
+                and not self._fingerprints.add(
+                    _path_fingerprint(parsed_pieces)):
+            return None, False
+        self._seen += count
+        if len(self._samples) < self._max_urls:
+            idx = len(self._samples)
+            self._samples.append(None)
+        else:
+            if self._random.random() * self._seen >= self._max_urls * count:
+                return None, True
+            idx = self._random.randrange(self._max_urls)
+            remove_from_tree(self._samples[idx])
+
+        node, is_new = build_from_parsed_pieces(
+            self._root, parsed_pieces, count=count, meta=meta, uniq=uniq,
+            max_examples=self._max_examples)
+        self._samples[idx] = node
+        self._clustered = None
+        return node, is_new
 
     def _cluster(self):
-        for clustered in cluster(self._config,
-                                 self._url_meta,
-                                 self._root):
+        if self._clustered is not None:
+            for clustered in self._clustered:
+                yield clustered
+            return
+        self._load_tree()
+        fingerprint = None
+        if self._cache is not None:
+            fingerprint = self.fingerprint()
+            cached = self._cache.get(fingerprint)
+            if cached is not None:
+                if self._incremental:
+                    self._clustered = cached
+                for clustered in cached:
+                    yield clustered
+                return
+        keep = self._incremental or fingerprint is not None
+        clustered_list = []
+        truncated = False
+        sampling = self.sampling
+        for clustered in self._cluster_with_budget():
+            if sampling:
+                clustered = self._scale(clustered)
+            if keep:
+                clustered_list.append(clustered)
+            truncated = truncated or clustered.truncated
             yield clustered
+        if fingerprint is not None and not truncated:
+            self._cache.put(fingerprint, clustered_list)
+        if self._incremental:
+            self._clustered = clustered_list
+
+    def fingerprint(self):
+        """Get the content fingerprint.
+
+        The fingerprint is made from the make configure, the url_meta,
+        the total count and each path of the piece tree with its count
+        and meta data. It is independent of the loading order.
+
+        Returns:
+            str: The hex fingerprint string.
+        """
+        self._load_tree()
+        paths_digest = 0
+        for nodes in dump_tree(self._root):
+            leaf = nodes[-1]
+            path = [n.piece for n in nodes[1:]]
+            path.append(str(leaf.count))
+            if leaf.meta:
+                path.extend(sorted([str(m) for m in leaf.meta]))
+            digest = hashlib.md5('\t'.join(path).encode('utf-8')).hexdigest()
+            paths_digest = (paths_digest + int(digest, 16)) % (1 << 128)
+        h = hashlib.md5(repr((_config_items(self._config),
+                              tuple(self._url_meta),
+                              self.total)).encode('utf-8'))
+        h.update(('%032x' % paths_digest).encode('utf-8'))
+        return h.hexdigest()
+
+    def _cluster_with_budget(self):
+        if self._max_cluster_seconds <= 0 and self._max_cluster_visits <= 0:
+            return cluster(self._config, self._url_meta, self._root,
+                           stats=self._stats)
+        budget = ClusterBudget(self._max_cluster_seconds,
+                               self._max_cluster_visits)
+        try:
+            return list(cluster(self._config, self._url_meta, self._root,
+                                stats=self._stats, budget=budget))
+        except ClusterBudgetExceededException as e:
+            _logger.warning('[TRUNCATED] %s, %s, %d visits',
+                            str(e), self._url_meta, budget.visits)
+        return [self._fallback()]
+
+    def _fallback(self):
+        root = TruncatedPiecePatternNode((EMPTY_PARSED_PIECE, None))
+        for nodes in dump_tree(self._root):
+            build_from_piece_pattern_nodes(root, nodes[1:])
+        patterns = {}
+        for nodes in dump_tree(root):
+            for node in nodes[1:]:
+                fuzzy_rule = node.parsed_piece.fuzzy_rule
+                if fuzzy_rule not in patterns:
+                    patterns[fuzzy_rule] = Pattern(
+                        wildcard_rule(fuzzy_rule)) if fuzzy_rule \
+                        else BasePattern.EMPTY
+                node.set_pattern(patterns[fuzzy_rule])
+        return root
+
+    def _scale(self, clustered):
+        if clustered is self._root:
+            root = PiecePatternNode((EMPTY_PARSED_PIECE, None))
+            for nodes in dump_tree(clustered):
+                build_from_piece_pattern_nodes(root, nodes[1:])
+            clustered = root
+        clustered.count = int(
+            round(clustered.count * self.total / float(self._root.count)))
+        return clustered
+
+    def get_state(self):
+        """Get the picklable state.
+
+        The piece tree of a restored maker is kept serialized until it
+        is modified, the serialized data is returned as it is.
+
+        Returns:
+            tuple: 3-tuple, (url_meta, tree_data, clustered_records).
+                The tree_data is the pickled 3-tuple, (tree_records,
+                seen, fingerprints), the fingerprints is None without
+                sampling or distinct. The clustered_records is list of
+                the compact records of the clustered trees, None if the
+                maker is dirty.
+        """
+        tree_data = self._tree_data
+        if tree_data is None:
+            tree_data = pickle.dumps((dump_piece_pattern_tree(self._root),
+                                      self._seen,
+                                      self._fingerprints), 2)
+        clustered_records = None
+        if self._clustered is not None:
+            if self._clustered_records is not None \
+                    and self._clustered_records[0] is self._clustered:
+                clustered_records = self._clustered_records[1]
+            else:
+                clustered_records = [_dump_clustered(c)
+                                     for c in self._clustered]
+        return (tuple(self._url_meta), tree_data, clustered_records)
+
+    @classmethod
+    def from_state(cls, state, config=None, keep_clustered=True, stats=None,
+                   cache=None):
+        """Create an incremental Maker from the state.
+
+        The piece tree is loaded only when it is needed, such as new
+        urls are loaded or the maker is dirty.
+
+        Args:
+            state (tuple): The state from get_state.
+            config (Config, optional): Defaults to None. The configure.
+            keep_clustered (bool, optional): Defaults to True. Whether
+                restore the clustered results.
+            stats (ClusterStats, optional): Defaults to None. Record the
+                statistics of the cluster procedure if specified.
+            cache (ClusterCache, optional): Defaults to None. The cache
+                of the clustered results.
+
+        Returns:
+            Maker: The restored Maker.
+        """
+        url_meta, tree_data, clustered_records = state
+        maker = cls(URLMeta(*url_meta), config, True, stats=stats, cache=cache)
+        maker._tree_data = tree_data
+        if keep_clustered and clustered_records is not None:
+            maker._clustered = [_load_clustered(r) for r in clustered_records]
+            maker._clustered_records = (maker._clustered, clustered_records)
+        return maker
 
     def _combine_clusters(self):
         root = TreeNode(BasePattern.EMPTY)
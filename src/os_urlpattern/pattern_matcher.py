@@ -10,7 +10,7 @@ from .parsed_piece_view import (FuzzyView, LastDotSplitFuzzyView, LengthView,
                                 MixedView, MultiView, PieceView,
                                 view_cls_from_pattern)
 from .parser import fuzzy_digest, parse
-from .pattern import Pattern
+from .pattern import MAX_INTERNED_PATTERNS, Pattern
 from .utils import TreeNode, build_tree
 
 
@@ -21,30 +21,61 @@ class MatchPattern(Pattern):
     It is comparable and has a view_cls property to
     identify the pattern type.
     """
-    __slots__ = ('view_cls', '_cmp_key')
+    __slots__ = ('view_cls', '_sort_key')
 
     def __init__(self, pattern_string, is_last_path=False):
         super(MatchPattern, self).__init__(pattern_string)
         self.view_cls = view_cls_from_pattern(self, is_last_path)
-        self._cmp_key = None
+        self._sort_key = None
 
     @property
-    def cmp_key(self):
-        """str: Used for sort."""
+    def sort_key(self):
+        """tuple: Used for sort, the more specific the greater.
 
-        if self._cmp_key is None:
-            l = [MatchPattern(u.pattern_unit_string)
-                 for u in reversed(self.pattern_units)]
-            self._cmp_key = ''.join([str(VIEW_ORDER[p.view_cls]) for p in l])
-        return self._cmp_key
+        The view order of the pattern, then the view orders of the
+        pattern units from the last one, all negated. The trailing 1
+        is greater than any negated order, so a pattern with more
+        pattern units is less.
+        """
+        if self._sort_key is None:
+            self._sort_key = (-VIEW_ORDER[self.view_cls],) + tuple(
+                [-VIEW_ORDER[get_match_pattern(u.pattern_unit_string).view_cls]
+                 for u in reversed(self.pattern_units)]) + (1,)
+        return self._sort_key
 
     def __ne__(self, other):
         return self.pattern_string != other.pattern_string
 
     def __lt__(self, other):
-        if self.view_cls == other.view_cls:
-            return self.cmp_key > other.cmp_key
-        return VIEW_ORDER[self.view_cls] > VIEW_ORDER[other.view_cls]
+        return self.sort_key < other.sort_key
+
+
+_MATCH_PATTERNS = {}
+
+
+def get_match_pattern(pattern_string, is_last_path=False):
+    """Get the interned MatchPattern object.
+
+    The same pattern strings are loaded again and again into the match
+    trees, they share one MatchPattern object. The interned objects are
+    cleared when the number of them exceeds MAX_INTERNED_PATTERNS.
+
+    Args:
+        pattern_string (str): The pattern string.
+        is_last_path (bool, optional): Defaults to False. Whether the
+            pattern is the last path level.
+
+    Returns:
+        MatchPattern: The shared MatchPattern object.
+    """
+    key = (pattern_string, is_last_path)
+    pattern = _MATCH_PATTERNS.get(key)
+    if pattern is None:
+        if len(_MATCH_PATTERNS) >= MAX_INTERNED_PATTERNS:
+            _MATCH_PATTERNS.clear()
+        pattern = _MATCH_PATTERNS[key] = MatchPattern(
+            pattern_string, is_last_path)
+    return pattern
 
 
 EMPTY_MATCH_PATTERN = MatchPattern(BasePatternRule.EMPTY)
@@ -106,7 +137,7 @@ class MultiPatternViewMatcher(ViewMatcher):
         r = fuzzy_join(pattern.pattern_units)
         if r not in self._matchers:
             self._matchers[r] = PatternMatchNode(EMPTY_MATCH_PATTERN)
-        patterns = [MatchPattern(p.pattern_unit_string)
+        patterns = [get_match_pattern(p.pattern_unit_string)
                     for p in pattern.pattern_units]
         matcher = self._matchers[r]
         build_tree(matcher, patterns, meta=match_node)
@@ -115,7 +146,8 @@ class MultiPatternViewMatcher(ViewMatcher):
 class MixedPatternViewMatcher(MultiPatternViewMatcher):
 
     def _pattern(self, pattern_units):
-        return MatchPattern(''.join([p.pattern_unit_string for p in pattern_units]))
+        return get_match_pattern(
+            ''.join([p.pattern_unit_string for p in pattern_units]))
 
     def add_match_node(self, match_node):
         patterns = []
@@ -182,11 +214,12 @@ def get_view_matcher_cls(view_cls):
 class PatternMatchNode(TreeNode):
     """Node for building a match tree."""
 
-    __slots__ = ('_view_matchers',)
+    __slots__ = ('_view_matchers', '_sort_key')
 
     def __init__(self, value):
         super(PatternMatchNode, self).__init__(value)
         self._view_matchers = []
+        self._sort_key = None
 
     @property
     def view_cls(self):
@@ -253,12 +286,21 @@ class PatternMatchNode(TreeNode):
             matcher.add_match_node(child)
         return child, is_new
 
+    @property
+    def sort_key(self):
+        """tuple: Used for sort, sort keys of the patterns from this
+        node up to the root, the root excluded."""
+        if self._sort_key is None:
+            sort_keys = []
+            node = self
+            while node.parrent is not None:
+                sort_keys.append(node.pattern.sort_key)
+                node = node.parrent
+            self._sort_key = tuple(sort_keys)
+        return self._sort_key
+
     def __lt__(self, other):
-        if id(self) == id(other) or self.parrent is None:
-            return False
-        if self.pattern == other.pattern:
-            return self.parrent < other.parrent
-        return self.pattern < other.pattern
+        return self.sort_key < other.sort_key
 
 
 class PatternMatcher(object):
@@ -352,4 +394,8 @@ class Matcher(object):
         Returns:
             tuple: 2-tules, (node, is_new).
         """
-        return build_tree(self._root, parsed_patterns, meta=meta)
+        node, is_new = build_tree(self._root, parsed_patterns, meta=meta)
+        if is_new:
+            node._sort_key = tuple(
+                [p.sort_key for p in reversed(parsed_patterns)])
+        return node, is_new
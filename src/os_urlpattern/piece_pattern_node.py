@@ -5,19 +5,29 @@ Build a tree from the parsed URL pieces.
 from __future__ import unicode_literals
 
 from .compat import itervalues
-from .parse_utils import EMPTY_PARSED_PIECE
+from .parse_utils import EMPTY_PARSED_PIECE, ParsedPiece, intern_rules
 from .pattern import Pattern
-from .utils import TreeNode, build_tree
+from .utils import Examples, TreeNode, build_tree
 
 
 class PiecePatternNode(TreeNode):
-    """Node for building raw piece tree."""
+    """Node for building raw piece tree.
 
-    __slots__ = ('_pattern',)
+    The examples is the number of the children which keep meta data,
+    of the root it is the number of all the leaves which keep meta data.
+    With max_examples > 0, at most max_examples children of a node and
+    at most max_examples * max_examples leaves of a tree can keep meta
+    data.
+    """
+
+    __slots__ = ('_pattern', 'examples')
+
+    truncated = False
 
     def __init__(self, parsed_piece_and_pattern):
         parsed_piece, self._pattern = parsed_piece_and_pattern
         super(PiecePatternNode, self).__init__(parsed_piece)
+        self.examples = 0
 
     def set_pattern(self, pattern):
         self._pattern = pattern
@@ -36,10 +46,6 @@ class PiecePatternNode(TreeNode):
     def parsed_piece(self):
         return self.value
 
-    @property
-    def children_num(self):
-        return len(self._children)
-
     def incr_count(self, count, recur=False):
         self.count += count
         node = self.parrent if recur else None
@@ -50,22 +56,65 @@ class PiecePatternNode(TreeNode):
     def __str__(self):
         return ' '.join((self.piece, str(self.pattern)))
 
-    def add_meta(self, data):
+    def _hold_meta(self, max_examples):
+        parrent = self.parrent
+        if max_examples <= 0 or parrent is None:
+            return True
+        root = parrent
+        while root.parrent is not None:
+            root = root.parrent
+        if parrent.examples >= max_examples \
+                or root.examples >= max_examples * max_examples:
+            return False
+        parrent.examples += 1
+        if root is not parrent:
+            root.examples += 1
+        return True
+
+    def add_meta(self, data, max_examples=0):
+        """Add meta data.
+
+        With max_examples > 0, the meta data is dropped if the parent
+        already has max_examples children keeping meta data or the
+        tree already has max_examples * max_examples ones.
+
+        Returns:
+            bool: Whether the kept meta data is changed.
+        """
         if data is None:
-            return
+            return False
         if self.meta is None:
-            self.meta = set()
+            if not self._hold_meta(max_examples):
+                return False
+            self.meta = Examples(max_examples) if max_examples > 0 else set()
+        if isinstance(self.meta, Examples):
+            return self.meta.add(data)
+        if data in self.meta:
+            return False
         self.meta.add(data)
+        return True
 
-    def update_meta(self, data):
+    def update_meta(self, data, max_examples=0):
         if not data:
             return
         if self.meta is None:
-            self.meta = set()
+            if not self._hold_meta(max_examples):
+                return
+            self.meta = Examples(data.max_num) \
+                if isinstance(data, Examples) else set()
         self.meta.update(data)
 
 
-def build_from_parsed_pieces(root, parsed_pieces, count=1, meta=None, uniq=True):
+class TruncatedPiecePatternNode(PiecePatternNode):
+    """Node of the fallback tree made when clustering is truncated."""
+
+    __slots__ = ()
+
+    truncated = True
+
+
+def build_from_parsed_pieces(root, parsed_pieces, count=1, meta=None,
+                             uniq=True, max_examples=0):
     """Build piece pattern tree from parsed pieces.
 
     Args:
@@ -74,6 +123,8 @@ def build_from_parsed_pieces(root, parsed_pieces, count=1, meta=None, uniq=True)
         count (int, optional): Defaults to 1. 
         meta ([type], optional): Defaults to None. The meta data will bind to the leaf node.
         uniq (bool, optional): Defaults to True. The duplicated node edge will not add.
+        max_examples (int, optional): Defaults to 0. Keep at most max_examples
+            meta data of the leaf node, 0 means keep all.
 
     Returns:
         tuple: 2-tuple, (leaf_node, is_new)
@@ -82,10 +133,55 @@ def build_from_parsed_pieces(root, parsed_pieces, count=1, meta=None, uniq=True)
                                      for parsed_piece in parsed_pieces], count)
     if uniq and not is_new:
         node.incr_count(0 - count, True)
-    node.add_meta(meta)
+    node.add_meta(meta, max_examples)
     return node, is_new
 
 
+def find_from_parsed_pieces(root, parsed_pieces):
+    """Find the leaf node of the parsed pieces.
+
+    Args:
+        root (PiecePatternNode): The root node of the a tree.
+        parsed_pieces (sequence): The parsed pieces.
+
+    Returns:
+        PiecePatternNode: The leaf node, None if not exist.
+    """
+    node = root
+    for parsed_piece in parsed_pieces:
+        node = node.get_child(parsed_piece.piece)
+        if node is None:
+            break
+    return node
+
+
+def remove_from_tree(node):
+    """Remove a leaf node from its tree.
+
+    The count of the node is subtracted from all of its ancestors
+    and the nodes which count become zero are removed.
+
+    Args:
+        node (PiecePatternNode): The leaf node to be removed.
+    """
+    count = node.count
+    if node.meta is not None and node.parrent is not None:
+        root = node.parrent
+        while root.parrent is not None:
+            root = root.parrent
+        if node.parrent.examples > 0:
+            node.parrent.examples -= 1
+        if root is not node.parrent and root.examples > 0:
+            root.examples -= 1
+    while node.parrent is not None:
+        parrent = node.parrent
+        node.count -= count
+        if node.count <= 0:
+            parrent.remove_child(node.piece)
+        node = parrent
+    node.count -= count
+
+
 def build_from_piece_pattern_nodes(root, piece_pattern_nodes):
     """Build piece pattern tree from piece pattern tree edge.
 
@@ -101,3 +197,91 @@ def build_from_piece_pattern_nodes(root, piece_pattern_nodes):
                                      for p in piece_pattern_nodes], last.count)
     node.update_meta(last.meta)
     return node, is_new
+
+
+def copy_piece_pattern_tree(node, parrent):
+    """Copy the sub-tree of node as a child of parrent.
+
+    The count of parrent is not changed.
+
+    Args:
+        node (PiecePatternNode): The root node of the sub-tree.
+        parrent (PiecePatternNode): The parrent of the copied sub-tree.
+
+    Returns:
+        PiecePatternNode: The copied node.
+    """
+    copied = None
+    stack = [(node, parrent)]
+    while stack:
+        node, parrent = stack.pop()
+        child, _ = parrent.add_child(
+            (node.piece, (node.parsed_piece, node.pattern)))
+        child.count += node.count
+        child.update_meta(node.meta)
+        if copied is None:
+            copied = child
+        stack.extend([(c, child) for c in reversed(list(node.children))])
+    return copied
+
+
+def dump_piece_pattern_tree(root, with_pattern=False):
+    """Dump piece pattern tree into plain records.
+
+    The records are in pre-order, each one is a tuple of
+    (depth, pieces, rules, count, meta) and the pattern string
+    is appended if with_pattern=True.
+
+    Args:
+        root (PiecePatternNode): The root node of a tree.
+        with_pattern (bool, optional): Defaults to False. Whether
+            dump the pattern string of each node.
+
+    Returns:
+        list: The pre-order records.
+    """
+    records = []
+    stack = [(root, 0)]
+    while stack:
+        node, depth = stack.pop()
+        parsed_piece = node.parsed_piece
+        record = (depth, parsed_piece.pieces,
+                  parsed_piece.rules, node.count, node.meta)
+        if with_pattern:
+            record += (node.pattern.pattern_string,)
+        records.append(record)
+        stack.extend(reversed([(child, depth + 1)
+                               for child in node.children]))
+    return records
+
+
+def load_piece_pattern_tree(records, node_cls=PiecePatternNode):
+    """Load piece pattern tree from the records of dump_piece_pattern_tree.
+
+    Args:
+        records (sequence): The pre-order records.
+        node_cls (type, optional): Defaults to PiecePatternNode.
+            The class of the tree nodes.
+
+    Returns:
+        PiecePatternNode: The root node of the tree.
+    """
+    path = []
+    for record in records:
+        depth, pieces, rules, count, meta = record[:5]
+        pattern = Pattern(record[5]) if len(record) > 5 else None
+        del path[depth:]
+        if depth == 0:
+            node = node_cls((EMPTY_PARSED_PIECE, pattern))
+        else:
+            parsed_piece = ParsedPiece(pieces, *intern_rules(rules))
+            node, _ = path[-1].add_child(
+                (parsed_piece.piece, (parsed_piece, pattern)))
+        node.count = count
+        node.meta = meta
+        if meta is not None and depth > 0:
+            path[-1].examples += 1
+            if depth > 1:
+                path[0].examples += 1
+        path.append(node)
+    return path[0] if path else None
@@ -1,14 +1,26 @@
 """Utilities.
 """
+import bz2
+import hashlib
 import inspect
 import logging
 import math
 import os
+import struct
 import time
+import zlib
+from array import array
 from functools import partial
 
 from .compat import iteritems, itervalues
 
+try:
+    import lzma
+except ImportError:
+    lzma = None
+
+_logger = logging.getLogger(__name__)
+
 
 def pretty_counter(counter):
     """Format a dict like object.
@@ -67,8 +79,143 @@ class Bag(object):
                 yield obj
 
 
+class Examples(object):
+    """Bounded uniq objects container.
+
+    Keep the first max_num uniq objects, the total number of
+    added objects is counted.
+    """
+
+    __slots__ = ('_objs', 'max_num', 'count')
+
+    def __init__(self, max_num):
+        self._objs = []
+        self.max_num = max_num
+        self.count = 0
+
+    def add(self, obj):
+        """Add an object.
+
+        Returns:
+            bool: Whether the object is kept.
+        """
+        self.count += 1
+        if len(self._objs) < self.max_num and obj not in self._objs:
+            self._objs.append(obj)
+            return True
+        return False
+
+    def update(self, objs):
+        if isinstance(objs, Examples):
+            for obj in objs:
+                if len(self._objs) >= self.max_num:
+                    break
+                if obj not in self._objs:
+                    self._objs.append(obj)
+            self.count += objs.count
+            return
+        for obj in objs:
+            self.add(obj)
+
+    def __len__(self):
+        return len(self._objs)
+
+    def __iter__(self):
+        return iter(self._objs)
+
+
+class FingerprintSet(object):
+    """Compact set of 64-bit fingerprints.
+
+    The fingerprints are kept in an array with open addressing, about
+    16 bytes each, much smaller than a set of strings.
+
+    Args:
+        capacity (int, optional): Defaults to 1024. Initial capacity,
+            rounded up to power of 2.
+    """
+
+    __slots__ = ('_table', '_mask', '_size')
+
+    _TYPECODE = 'Q' if 'Q' in getattr(array, 'typecodes', '') else 'L'
+    _MAX_VALUE = (1 << (8 * array(_TYPECODE).itemsize)) - 1
+
+    def __init__(self, capacity=1024):
+        size = 1
+        while size < capacity:
+            size <<= 1
+        self._table = array(self._TYPECODE, [0]) * size
+        self._mask = size - 1
+        self._size = 0
+
+    @classmethod
+    def fingerprint(cls, data):
+        """Get the fingerprint of data.
+
+        Args:
+            data (str or bytes): The data.
+
+        Returns:
+            int: The non-zero fingerprint.
+        """
+        if not isinstance(data, bytes):
+            data = data.encode('utf-8')
+        fp = struct.unpack('<Q', hashlib.md5(data).digest()[:8])[0]
+        return (fp & cls._MAX_VALUE) or 1
+
+    def _index(self, fp):
+        table = self._table
+        mask = self._mask
+        idx = fp & mask
+        while table[idx] and table[idx] != fp:
+            idx = (idx + 1) & mask
+        return idx
+
+    def __contains__(self, fp):
+        return self._table[self._index(fp)] == fp
+
+    def __len__(self):
+        return self._size
+
+    def __iter__(self):
+        for fp in self._table:
+            if fp:
+                yield fp
+
+    def add(self, fp):
+        """Add a fingerprint.
+
+        Args:
+            fp (int): The fingerprint.
+
+        Returns:
+            bool: Whether the fingerprint is new.
+        """
+        idx = self._index(fp)
+        if self._table[idx] == fp:
+            return False
+        self._table[idx] = fp
+        self._size += 1
+        if self._size * 2 > len(self._table):
+            self._grow()
+        return True
+
+    def _grow(self):
+        old_table = self._table
+        self._table = array(self._TYPECODE, [0]) * (len(old_table) * 2)
+        self._mask = len(self._table) - 1
+        for fp in old_table:
+            if fp:
+                self._table[self._index(fp)] = fp
+
+
 class TreeNode(object):
-    """Node of a tree."""
+    """Node of a tree.
+
+    Most nodes have only one child, the single child is kept inline
+    as a (key, node) tuple, a dict is created when the second child
+    is added.
+    """
 
     __slots__ = ('parrent', '_children', 'count',
                  'value', 'meta', '_level')
@@ -82,7 +229,7 @@ class TreeNode(object):
         self._children = None
 
     def leaf(self):
-        return not self._children
+        return self._children is None
 
     @property
     def level(self):
@@ -98,7 +245,21 @@ class TreeNode(object):
 
     @property
     def children(self):
-        return itervalues(self._children if self._children is not None else {})
+        children = self._children
+        if children is None:
+            return ()
+        elif isinstance(children, tuple):
+            return (children[1],)
+        return itervalues(children)
+
+    @property
+    def children_num(self):
+        children = self._children
+        if children is None:
+            return 0
+        elif isinstance(children, tuple):
+            return 1
+        return len(children)
 
     def add_child(self, kv):
         """Add a node to the children data set.
@@ -110,17 +271,85 @@ class TreeNode(object):
         Returns:
             tuple: 2-tuple, (node, is_new).
         """
-
-        if self._children is None:
-            self._children = {}
         k, v = kv
-        is_new = False
-        if k not in self._children:
-            self._children[k] = self.__class__(v)
-            self._children[k].parrent = self
-            is_new = True
-        child = self._children[k]
-        return child, is_new
+        children = self._children
+        if children is None:
+            child = self.__class__(v)
+            child.parrent = self
+            self._children = (k, child)
+            return child, True
+        elif isinstance(children, tuple):
+            if children[0] == k:
+                return children[1], False
+            children = self._children = {children[0]: children[1]}
+        else:
+            child = children.get(k)
+            if child is not None:
+                return child, False
+        child = children[k] = self.__class__(v)
+        child.parrent = self
+        return child, True
+
+    def get_child(self, k):
+        """Get the child node by key.
+
+        Args:
+            k (object): The key of the child.
+
+        Returns:
+            TreeNode: The child node, None if not exist.
+        """
+        children = self._children
+        if children is None:
+            return None
+        elif isinstance(children, tuple):
+            return children[1] if children[0] == k else None
+        return children.get(k)
+
+    def attach_child(self, k, node):
+        """Attach an existing node as the child.
+
+        The node and its sub-tree are not copied, it should be at
+        the same level in the former tree which will not be used.
+
+        Args:
+            k (object): The key of the child.
+            node (TreeNode): The node to be attached.
+        """
+        node.parrent = self
+        children = self._children
+        if children is None or \
+                (isinstance(children, tuple) and children[0] == k):
+            self._children = (k, node)
+            return
+        elif isinstance(children, tuple):
+            children = self._children = {children[0]: children[1]}
+        children[k] = node
+
+    def remove_child(self, k):
+        """Remove the child node by key.
+
+        Args:
+            k (object): The key of the child.
+
+        Returns:
+            TreeNode: The removed child node, None if not exist.
+        """
+        children = self._children
+        if children is None:
+            return None
+        elif isinstance(children, tuple):
+            if children[0] != k:
+                return None
+            child = children[1]
+            self._children = None
+        else:
+            child = children.pop(k, None)
+            if not children:
+                self._children = None
+        if child is not None:
+            child.parrent = None
+        return child
 
 
 def build_tree(root, kv_sequence, count=1, meta=None):
@@ -151,26 +380,215 @@ def build_tree(root, kv_sequence, count=1, meta=None):
 def dump_tree(root):
     """Dump each path of a tree.
 
+    The tree is walked with an explicit stack, the yielded list is
+    reused and changed after the next path is yielded.
+
     Args:
         root (TreeNode): The root node of a tree.
 
     Yields:
         list: List contains nodes from root to leaf as one path.
     """
-    olist = []
+    nodes = [root]
+    if root.leaf():
+        yield nodes
+        return
+    iters = [iter(root.children)]
+    while iters:
+        node = next(iters[-1], None)
+        if node is None:
+            iters.pop()
+            nodes.pop()
+            continue
+        nodes.append(node)
+        if node.leaf():
+            yield nodes
+            nodes.pop()
+        else:
+            iters.append(iter(node.children))
+
 
-    def _dump(node, _nodes):
-        _nodes.append(node)
+def iter_leaves(root):
+    """Iterate the leaves of a tree from left to right.
+
+    Args:
+        root (TreeNode): The root node of a tree.
+
+    Yields:
+        TreeNode: The leaf node, the root if it is a leaf.
+    """
+    for node in iter_preorder(root):
         if node.leaf():
-            yield _nodes
+            yield node
+
+
+def iter_preorder(root):
+    """Iterate the nodes of a tree in pre-order.
+
+    Args:
+        root (TreeNode): The root node of a tree.
+
+    Yields:
+        TreeNode: The node, parrent before its children.
+    """
+    yield root
+    iters = [iter(root.children)]
+    while iters:
+        node = next(iters[-1], None)
+        if node is None:
+            iters.pop()
+            continue
+        yield node
+        if not node.leaf():
+            iters.append(iter(node.children))
+
+
+# global variables for iter_lines
+DEFAULT_CHUNK_SIZE = 1 << 20
+_MAGIC_LENGTH = 6
+
+
+def _gzip_decompressor():
+    return zlib.decompressobj(16 + zlib.MAX_WBITS)
+
+
+def _xz_decompressor():
+    if lzma is None:
+        raise ValueError('xz input is not supported, lzma is not installed')
+    return lzma.LZMADecompressor()
+
+
+_DECOMPRESSORS = (
+    (b'\x1f\x8b', _gzip_decompressor),
+    (b'BZh', bz2.BZ2Decompressor),
+    (b'\xfd7zXZ\x00', _xz_decompressor),
+)
+
+
+def _iter_chunks(fileobj, chunk_size):
+    read = getattr(fileobj, 'read1', fileobj.read)
+    data = read(chunk_size)
+    while data and len(data) < _MAGIC_LENGTH:
+        more = read(chunk_size)
+        if not more:
+            break
+        data += more
+
+    decompressor_cls = None
+    for magic, cls in _DECOMPRESSORS:
+        if data.startswith(magic):
+            decompressor_cls = cls
+            break
+
+    if decompressor_cls is None:
+        while data:
+            yield data
+            data = read(chunk_size)
+        return
+
+    decompressor = decompressor_cls()
+    while data:
+        try:
+            chunk = decompressor.decompress(data)
+        except EOFError:
+            # the last stream ended exactly at the end of the last data
+            chunk = b''
+        else:
+            data = decompressor.unused_data
+        if chunk:
+            yield chunk
+        if not data:
+            data = read(chunk_size)
+            continue
+        # concatenated streams, such as multi-member gzip, the data
+        # after the end of a stream, skip the NUL padding and restart
+        # only if it is the same format
+        while True:
+            data = data.lstrip(b'\0')
+            if len(data) >= _MAGIC_LENGTH:
+                break
+            more = read(chunk_size)
+            if not more:
+                break
+            data += more
+        if not data:
             return
-        for child in node.children:
-            for nodes in _dump(child, _nodes):
-                yield nodes
-            _nodes.pop(-1)
+        if not data.startswith(magic):
+            _logger.warning('Ignore trailing garbage after compressed data')
+            return
+        decompressor = decompressor_cls()
 
-    for nodes in _dump(root, olist):
-        yield nodes
+
+def iter_lines(fileobjs, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Iterate lines of binary files.
+
+    The files are read in large chunks and split into lines, gzip, bz2
+    and xz compressed files are detected by magic bytes and decompressed
+    transparently.
+
+    Args:
+        fileobjs (iterable): The binary file objects.
+        chunk_size (int, optional): Defaults to DEFAULT_CHUNK_SIZE.
+            Bytes to be read each time.
+
+    Yields:
+        bytes: The line without line break.
+    """
+
+    for fileobj in fileobjs:
+        tail = b''
+        for chunk in _iter_chunks(fileobj, chunk_size):
+            lines = chunk.split(b'\n')
+            if tail:
+                lines[0] = tail + lines[0]
+            tail = lines.pop()
+            for line in lines:
+                yield line
+        if tail:
+            yield tail
+
+
+class OutputBuffer(object):
+    """Buffered binary output.
+
+    Data is collected in a bytearray and written to the file object
+    in large chunks.
+
+    Args:
+        fileobj (file): The binary file object.
+        buffer_size (int, optional): Defaults to DEFAULT_CHUNK_SIZE.
+            Bytes to be collected before written.
+    """
+
+    __slots__ = ('_fileobj', '_buffer', '_buffer_size')
+
+    def __init__(self, fileobj, buffer_size=DEFAULT_CHUNK_SIZE):
+        self._fileobj = fileobj
+        self._buffer = bytearray()
+        self._buffer_size = buffer_size
+
+    def write(self, data):
+        self._buffer += data
+        if len(self._buffer) >= self._buffer_size:
+            self.flush()
+
+    def write_line(self, data):
+        self._buffer += data
+        self._buffer += b'\n'
+        if len(self._buffer) >= self._buffer_size:
+            self.flush()
+
+    def flush(self):
+        if self._buffer:
+            self._fileobj.write(bytes(self._buffer))
+            del self._buffer[:]
+        self._fileobj.flush()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, exc_tb):
+        self.flush()
 
 
 class LogSpeedAdapter(logging.LoggerAdapter):
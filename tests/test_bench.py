@@ -0,0 +1,38 @@
+import json
+
+from os_urlpattern.bench import main, make_corpus, make_wide_corpus, run
+from os_urlpattern.formatter import FORMATTERS
+
+
+def test_make_corpus():
+    urls = make_corpus(100, seed=1)
+    assert len(urls) == 100
+    assert urls == make_corpus(100, seed=1)
+    assert urls != make_corpus(100, seed=2)
+
+
+def test_make_wide_corpus():
+    urls = make_wide_corpus(100)
+    assert len(set([url.split('/')[3] for url in urls])) == 100
+    assert urls == make_wide_corpus(100)
+
+
+def test_run():
+    report = run(num=300)
+    stages = report['stages']
+    for name in ['parse', 'load', 'make', 'matcher_load', 'match']:
+        assert name in stages
+    for name in FORMATTERS:
+        assert 'format_%s' % name.lower() in stages
+    assert stages['parse']['num'] == 300
+    assert stages['match']['num'] == 300
+    for stage in stages.values():
+        assert stage['p50'] <= stage['p90'] <= stage['p99']
+
+
+def test_main(tmpdir):
+    f = tmpdir.join('bench.json')
+    main(['bench', '-n', '100', '-w', '100', '-m', '-o', f.strpath])
+    report = json.loads(f.read())
+    assert report['corpus']['num'] == 100
+    assert report['stages']['make_wide']['num'] == 1
@@ -1,4 +1,6 @@
+import gzip
 import hashlib
+import json
 import os
 import shlex
 import subprocess
@@ -6,7 +8,7 @@ import sys
 
 import pytest
 
-from os_urlpattern.cmdline import make, match
+from os_urlpattern.cmdline import make, match, merge
 
 
 def call(cmdline, env=None, **kwargs):
@@ -50,6 +52,23 @@ def test_make(tmpdir):
     assert b' - #abc(%d)' % num
 
 
+def test_make_gzip(tmpdir):
+    urls = ['http://example.com/abc%02d.html' % i for i in range(0, 10)]
+    f = tmpdir.join('urls.txt.gz')
+    with gzip.open(f.strpath, 'wb') as g:
+        g.write("\n".join(urls).encode())
+    cmdline = 'make -i %s -f json' % f.strpath
+    stdout, _ = call(cmdline)
+    assert b'"cnt": 10' in stdout
+
+    fp = tmpdir.join('patterns.txt.gz')
+    with gzip.open(fp.strpath, 'wb') as g:
+        g.write(b'/abc[0-9]{2}[\\.]html\n')
+    cmdline = 'match -i %s -p %s' % (f.strpath, fp.strpath)
+    stdout, _ = call(cmdline)
+    assert stdout.count(b'/abc[0-9]{2}[\\.]html\t') == 10
+
+
 def test_make_digest_type_urls(tmpdir):
     urls = ['http://example.com/%s.html' % j for j in
             [hashlib.md5(str(i).encode()).hexdigest() for i in range(0, 9)]]
@@ -101,6 +120,137 @@ def test_make_fuzzy(tmpdir):
     assert b'/abc/[a-z]+[\\.]html' in stdout
 
 
+def test_make_snapshot(tmpdir):
+    urls = ['http://example.com/abc%02d.html' % i for i in range(0, 9)]
+    f = tmpdir.join('urls01.txt')
+    f.write("\n".join(urls))
+    snapshot = tmpdir.join('snapshot')
+    cmdline = 'make -i %s -f json --snapshot %s' % (f.strpath, snapshot.strpath)
+    stdout, _ = call(cmdline)
+    assert b'"cnt": 9' in stdout
+    assert snapshot.check()
+
+    f = tmpdir.join('urls02.txt')
+    f.write('http://example.com/abc09.html')
+    cmdline = 'make -i %s -f json --snapshot %s' % (f.strpath, snapshot.strpath)
+    stdout, _ = call(cmdline)
+    assert b'/abc[0-9]{2}[\\\\.]html' in stdout
+    assert b'"cnt": 10' in stdout
+
+
+def test_make_cache(tmpdir):
+    urls = ['http://example.com/abc%02d.html' % i for i in range(0, 10)]
+    f = tmpdir.join('urls.txt')
+    f.write("\n".join(urls))
+    cache_dir = tmpdir.join('cache')
+    cmdline = 'make -i %s -f json --cache-dir %s' % (f.strpath,
+                                                     cache_dir.strpath)
+    stdout, _ = call(cmdline)
+    assert len(cache_dir.listdir()) == 1
+    assert call(cmdline)[0] == stdout
+
+
+def test_make_merge(tmpdir):
+    snapshots = []
+    for i in range(0, 2):
+        urls = ['http://example.com/abc%d%d.html' % (i, j) for j in range(0, 5)]
+        f = tmpdir.join('urls%02d.txt' % i)
+        f.write("\n".join(urls))
+        snapshot = tmpdir.join('snapshot%02d' % i)
+        cmdline = 'make -i %s --load-only --snapshot %s' % (f.strpath,
+                                                           snapshot.strpath)
+        stdout, _ = call(cmdline)
+        assert not stdout
+        snapshots.append(snapshot.strpath)
+    f = tmpdir.join('empty.txt')
+    f.write('')
+    cmdline = 'make -i %s -f json --merge %s' % (f.strpath, ' '.join(snapshots))
+    stdout, _ = call(cmdline)
+    assert b'"cnt": 10' in stdout
+
+
+def test_make_stream(tmpdir):
+    urls = ['http://example.com/abc%02d.html' % i for i in range(0, 10)]
+    f = tmpdir.join('urls.txt')
+    f.write("\n".join(urls))
+    cmdline = 'make -i %s -f pattern --emit-every 5' % f.strpath
+    stdout, _ = call(cmdline)
+    assert stdout.count(b'/abc[0-9]{2}[\\.]html') == 2
+
+
+def test_make_weighted(tmpdir):
+    urls = ['http://example.com/abc%02d.html\t%d' % (i, i + 1)
+            for i in range(0, 9)]
+    urls.append('http://example.com/abc00.html\t10')
+    urls.append('http://example.com/abc00.html')
+    f = tmpdir.join('urls.txt')
+    f.write("\n".join(urls))
+    cmdline = 'make -i %s -f json -w' % f.strpath
+    stdout, _ = call(cmdline)
+    assert b'"cnt": 55' in stdout
+
+
+@pytest.mark.parametrize('format_type', ['json', 'cluster', 'inline'])
+def test_make_dedupe(tmpdir, format_type):
+    urls = ['http://example.com/abc%02d.html' % i for i in range(0, 10)]
+    f = tmpdir.join('urls.txt')
+    f.write("\n".join(urls + urls))
+    cmdline = 'make -i %s -f %s --dedupe -l debug' % (f.strpath, format_type)
+    stdout, stderr = call(cmdline)
+    assert b'DUPLICATE:10' in stderr
+    if format_type == 'json':
+        assert b'"cnt": 10' in stdout
+    else:
+        assert stdout.count(b'abc00.html') == 1
+
+
+def test_make_max_examples(tmpdir):
+    urls = ['http://example.com/abc%02d.html' % i for i in range(0, 10)]
+    f = tmpdir.join('urls.txt')
+    f.write("\n".join(urls))
+    cmdline = 'make -i %s -f inline --max-examples 3' % f.strpath
+    stdout, _ = call(cmdline)
+    assert stdout.count(b'/abc[0-9]{2}[\\.]html\t') == 3
+
+
+def test_make_stats_json(tmpdir):
+    urls = ['http://example.com/abc%02d.html' % i for i in range(0, 10)]
+    f = tmpdir.join('urls.txt')
+    f.write("\n".join(urls))
+    stats_json = tmpdir.join('stats.json')
+    cmdline = 'make -i %s -f pattern --stats-json %s' % (
+        f.strpath, stats_json.strpath)
+    call(cmdline)
+    stats = json.loads(stats_json.read())
+    assert stats['cluster']['PiecePatternCluster']['calls'] > 0
+    if sys.version_info >= (3, 4):
+        assert stats['cluster']['PiecePatternCluster']['memory'] > 0
+
+
+def test_merge(tmpdir):
+    inputs = []
+    for i, patterns in enumerate([['/item/[0-9]{2}', '/abc'],
+                                  ['/item/[0-9]{3}', '/item/[0-9]+']]):
+        f = tmpdir.join('patterns%02d.txt' % i)
+        f.write("\n".join([json.dumps({'ptn': p, 'cnt': 10})
+                           for p in patterns]))
+        inputs.append(f.strpath)
+    cmdline = 'merge -i %s' % ' '.join(inputs)
+    stdout, _ = call(cmdline)
+    assert b'{"ptn": "/item/[0-9]+", "cnt": 30}' in stdout
+    assert b'{"ptn": "/abc", "cnt": 10}' in stdout
+
+
+def test_merge_absorb(tmpdir):
+    f = tmpdir.join('patterns.txt')
+    f.write("\n".join([json.dumps({'ptn': p, 'cnt': c})
+                       for p, c in [('/q/abc', 1), ('/q/def', 1),
+                                    ('/q/[a-z]+', 100)]]))
+    cmdline = 'merge -i %s' % f.strpath
+    stdout, _ = call(cmdline)
+    assert stdout.strip() == b'{"ptn": "/q/[a-z]+", "cnt": 102}'
+
+
 def test_match(tmpdir):
     pattern = b'/abc[0-9]{2}'
     fp = tmpdir.join('patterns.txt')
@@ -117,10 +267,26 @@ def test_match(tmpdir):
     assert pattern in stdout
 
 
+def test_match_all_matched(tmpdir):
+    fp = tmpdir.join('patterns.txt')
+    fp.write('\n'.join(['/[a-z]+[0-9]+', '/abc[0-9]{2}', '/abc[0-9]+']))
+    fu = tmpdir.join('urls.txt')
+    fu.write('http://example.com/abc01')
+
+    cmdline = 'match -i %s -p %s' % (fu.strpath, fp.strpath)
+    stdout, _ = call(cmdline)
+    assert stdout.startswith(b'/abc[0-9]{2}\t')
+
+    cmdline = 'match -i %s -p %s -a' % (fu.strpath, fp.strpath)
+    stdout, _ = call(cmdline)
+    assert stdout.startswith(
+        b'/abc[0-9]{2}\t/abc[0-9]+\t/[a-z]+[0-9]+\t')
+
+
 if __name__ == "__main__":
     sys.path.insert(0, os.getcwd())
     if os.getenv('COVERAGE_PROCESS_START'):
         import coverage
         coverage.process_startup()
-    cmds = {'make': make, 'match': match}
+    cmds = {'make': make, 'match': match, 'merge': merge}
     cmds[sys.argv.pop(1)]()
@@ -6,3 +6,7 @@ from os_urlpattern.config import get_default_config
 def test_get_default_config():
     config = get_default_config()
     assert config.getint('make', 'min_cluster_num') == 3
+    assert config.getint('make', 'max_urls_per_maker') == 0
+    assert config.getint('make', 'max_examples') == 0
+    assert config.getfloat('make', 'max_cluster_seconds') == 0
+    assert config.getint('make', 'max_cluster_visits') == 0
@@ -29,3 +29,11 @@ def test_json(p_maker):
             d = json.loads(o)
             assert d['ptn'] == '/abc/[0-9]{2}[\\.]html'
             assert d['cnt'] == 10
+
+
+def test_max_examples(p_maker):
+    for url_meta, clustered in p_maker.make():
+        records = list(pformat('cluster', url_meta, clustered, max_examples=3))
+        assert len(records) == 4
+        records = list(pformat('inline', url_meta, clustered, max_examples=3))
+        assert len(records) == 3
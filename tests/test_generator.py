@@ -0,0 +1,36 @@
+from os_urlpattern.formatter import pformat
+from os_urlpattern.generator import DEFAULT_TEMPLATES, URLGenerator
+from os_urlpattern.pattern_maker import PatternMaker
+from os_urlpattern.pattern_matcher import PatternMatcher
+
+
+def test_generate():
+    generator = URLGenerator(seed=1)
+    urls = [url for _, url in generator.generate(100)]
+    assert len(urls) == 100
+    assert urls == [url for _, url in URLGenerator(seed=1).generate(100)]
+
+
+def test_skew():
+    generator = URLGenerator(skew=2.0)
+    names = [t.name for t, _ in generator.generate(1000)]
+    first, last = DEFAULT_TEMPLATES[0].name, DEFAULT_TEMPLATES[-1].name
+    assert names.count(first) > names.count(last) * 10
+
+
+def test_expected_patterns():
+    generator = URLGenerator(skew=0)
+    pm = PatternMaker()
+    for _, url in generator.generate(5000):
+        pm.load(url)
+    patterns = set()
+    for url_meta, clustered in pm.make():
+        patterns.update(pformat('pattern', url_meta, clustered))
+    assert patterns == set(generator.patterns)
+
+    pattern_matcher = PatternMatcher()
+    for pattern in generator.patterns:
+        pattern_matcher.load(pattern, meta=pattern)
+    for template, url in generator.generate(100):
+        assert [m.meta for m in pattern_matcher.match(url)] == \
+            [template.pattern]
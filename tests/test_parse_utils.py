@@ -3,10 +3,13 @@ import pytest
 from os_urlpattern.exceptions import (InvalidCharException,
                                       InvalidPatternException,
                                       IrregularURLException)
-from os_urlpattern.parse_utils import (PieceParser, URLMeta, analyze_url,
-                                       analyze_url_pattern_string, digest,
-                                       filter_useless, fuzzy_digest, normalize,
-                                       pack, parse_pattern_string,
+from os_urlpattern.parse_utils import (ParsedPiece, PieceParser, URLMeta,
+                                       analyze_url, analyze_url_pattern_string,
+                                       digest,
+                                       filter_useless, fuzzy_digest,
+                                       intern_rules, normalize, pack,
+                                       parse_pattern_piece,
+                                       parse_pattern_string,
                                        parse_pattern_unit_string,
                                        parse_query_string, parse_url)
 from os_urlpattern.pattern import Pattern
@@ -118,10 +121,25 @@ def test_piece_parser():
         assert parsed.rules == expected_rules
         assert parsed.pieces == expected_pieces
         assert parsed.piece_length == len(piece)
+        assert ParsedPiece(parsed.pieces,
+                           parsed.rules).piece_length == len(piece)
     with pytest.raises(InvalidCharException):
         parser.parse(' a')
 
 
+def test_intern_rules():
+    parser = PieceParser()
+    p1 = parser.parse('abc123.html')
+    p2 = parser.parse('xyz9.htm')
+    assert p1.rules is p2.rules
+    assert p1.fuzzy_rule is p2.fuzzy_rule
+    assert p1.fuzzy_rule == '0-9\\.a-z'
+    rules, fuzzy_rule = intern_rules(('a-z', '0-9', 'a-z'))
+    assert rules == ('a-z', '0-9', 'a-z')
+    assert fuzzy_rule == '0-9a-z'
+    assert intern_rules(('a-z', '0-9', 'a-z'))[0] is rules
+
+
 def test_unpack_pack():
     data = [
         ('http://www.g.com/', '/'),
@@ -250,3 +268,16 @@ def test_digest():
             assert fuzzy_digest(url_meta, parsed_pieces) == sid
             digests.add(sid)
         assert len(digests) == 1
+
+
+def test_parse_pattern_piece():
+    data = [
+        ('abc[0-9]{2}[\\.]html', 'abc[0-9]{2}[\\.]html', '0-9\\.a-z', 10),
+        ('[%0-9A-Z]{18}', '[%0-9A-Z]{18}', '%0-9A-Z', 18),
+        ('[a-z]+[\\-][a-z]+', '[a-z]+[\\-][a-z]+', '\\-a-z', -1),
+    ]
+    for pattern_string, piece, fuzzy_rule, piece_length in data:
+        parsed_piece = parse_pattern_piece(pattern_string)
+        assert parsed_piece.piece == piece
+        assert parsed_piece.fuzzy_rule == fuzzy_rule
+        assert parsed_piece.piece_length == piece_length
@@ -1,6 +1,8 @@
+from os_urlpattern.parse_utils import PieceParser
 from os_urlpattern.parsed_piece_view import (FuzzyView, LastDotSplitFuzzyView,
                                              LengthView, MixedView, MultiView,
-                                             PieceView, view_cls_from_pattern)
+                                             PieceView, ViewCache,
+                                             view_cls_from_pattern)
 from os_urlpattern.pattern import Pattern
 
 
@@ -17,3 +19,13 @@ def test_view_cls_from_pattern():
 
     for p_str, view_cls, is_last_path in data:
         assert view_cls_from_pattern(Pattern(p_str), is_last_path) == view_cls
+
+
+def test_view_cache():
+    parser = PieceParser()
+    views = ViewCache()
+    view = views.get(MixedView, parser.parse('abc123.html'))
+    assert views.get(MixedView, parser.parse('abc123.html')) is view
+    assert views.get(MultiView, parser.parse('abc123.html')) is not view
+    assert views.get(MixedView, parser.parse('abc124.html')) is not view
+    assert len(views) == 3
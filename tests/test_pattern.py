@@ -1,5 +1,6 @@
 from os_urlpattern.parse_utils import specify_rule, wildcard_rule
-from os_urlpattern.pattern import Pattern, PatternUnit
+from os_urlpattern.pattern import (Pattern, PatternUnit, get_pattern_unit,
+                                   get_pattern_units)
 
 
 def test_equal():
@@ -45,3 +46,33 @@ def test_pattern_unit():
         assert pu.fuzzy_rule == fuzzy_rule
         assert pu.num == num
         assert pu.is_literal() == literal
+
+
+def test_intern_pattern_units():
+    p1 = Pattern('abc[0-9]+[\\.]html')
+    p2 = Pattern('xyz[0-9]+[\\.]html')
+    assert p1.pattern_units[1:] == p2.pattern_units[1:]
+    assert p1.pattern_units[1] is p2.pattern_units[1]
+    assert Pattern(p1.pattern_string).pattern_units is p1.pattern_units
+    assert get_pattern_units('[0-9]+')[0] is get_pattern_unit('[0-9]+')
+
+
+def test_covers():
+    data = [
+        ('[a-z]+', 'abc', True),
+        ('[a-z]+', '[a-z]{3}', True),
+        ('[a-z]{3}', 'abc', True),
+        ('[a-z]{3}', 'abcd', False),
+        ('[a-z]{3}', '[a-z]+', False),
+        ('[0-9a-z]+', 'abc[0-9]{2}', True),
+        ('[0-9a-z]{5}', 'abc[0-9]{2}', True),
+        ('abc[0-9]+', 'abc[0-9]{2}', True),
+        ('abc', '[a-z]+', False),
+        ('[a-z]+[\\.]html', 'abc[\\.]html', True),
+        ('[a-z]+', 'a[\\-]b', False),
+        ('[\\-a-z]+', 'a[\\-]b', True),
+        ('[0-9]+', 'abc', False),
+    ]
+
+    for s, o, covered in data:
+        assert Pattern(s).covers(Pattern(o)) == covered
@@ -0,0 +1,64 @@
+from __future__ import unicode_literals
+
+import pytest
+
+from os_urlpattern.parse_utils import (EMPTY_PARSED_PIECE, PieceParser,
+                                       analyze_url)
+from os_urlpattern.pattern import Pattern
+from os_urlpattern.pattern_cluster import PieceBag, split_by_pattern
+from os_urlpattern.piece_pattern_node import (PiecePatternNode,
+                                              build_from_parsed_pieces)
+from os_urlpattern.utils import dump_tree
+
+
+def _build_tree(urls):
+    parser = PieceParser()
+    root = PiecePatternNode((EMPTY_PARSED_PIECE, None))
+    for url in urls:
+        _, pieces = analyze_url(url)
+        parsed_pieces = [parser.parse(piece) for piece in pieces]
+        build_from_parsed_pieces(root, parsed_pieces, meta=url)
+    for nodes in dump_tree(root):
+        if nodes[1].piece == 'abc' and nodes[-1].piece.isdigit():
+            nodes[-1].set_pattern(Pattern('[0-9]+'))
+    return root
+
+
+def _paths(root):
+    return sorted([('/'.join([str(n.pattern) for n in nodes[1:]]),
+                    '/'.join([n.piece for n in nodes[1:]]),
+                    nodes[-1].count, sorted(nodes[-1].meta))
+                   for nodes in dump_tree(root)])
+
+
+@pytest.mark.parametrize('inplace', [False, True])
+def test_split_by_pattern(inplace):
+    urls = ['http://example.com/abc/%d' % i for i in range(0, 5)]
+    urls += ['http://example.com/abc/x', 'http://example.com/xyz/1']
+    root = _build_tree(urls)
+    expected = _paths(root)
+
+    sub_roots = split_by_pattern(root, inplace)
+    assert [r.count for r in sub_roots] == [5, 1, 1]
+    assert [len(list(dump_tree(r))) for r in sub_roots] == [5, 1, 1]
+    assert sorted(sum([_paths(r) for r in sub_roots], [])) == expected
+    for sub_root in sub_roots:
+        for nodes in dump_tree(sub_root):
+            assert nodes[1].parrent is sub_root
+            assert nodes[1].count == sub_root.count
+    if not inplace:
+        assert _paths(root) == expected
+
+
+def test_piece_bag():
+    urls = ['http://example.com/abc/1', 'http://example.com/abc/x',
+            'http://example.com/xyz/1']
+    root = _build_tree(urls)
+    piece_bag = PieceBag()
+    for nodes in dump_tree(root):
+        piece_bag.add(nodes[-1])
+    assert len(piece_bag) == 3
+    assert piece_bag.count == 3
+    assert piece_bag.p_nodes_count == 5
+    assert piece_bag.uniq_p_nodes_count == 3
+    assert len(piece_bag.p_nodes) == 2
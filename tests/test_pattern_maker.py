@@ -1,9 +1,15 @@
+import json
+import pickle
+from io import BytesIO
+
 import pytest
 
 from os_urlpattern.config import get_default_config
+from os_urlpattern.exceptions import InvalidCharException
+from os_urlpattern.formatter import pformat
 from os_urlpattern.parse_utils import pack
-from os_urlpattern.pattern_maker import PatternMaker
-from os_urlpattern.utils import dump_tree
+from os_urlpattern.pattern_maker import Maker, PatternMaker, StreamPatternMaker
+from os_urlpattern.utils import dump_tree, pick
 
 
 @pytest.fixture(scope='function')
@@ -63,3 +69,447 @@ def test_make():
 
                                                '/9s2m1m3j2d10', '/i2i2g4g23j0dsdm']]
     cluster_and_test(urls, '/[0-9a-z]+')
+
+
+def test_incremental(config):
+    pm = PatternMaker(config, incremental=True)
+    urls01 = ['http://example.com/abc%02d.html' % i for i in range(0, 10)]
+    urls02 = ['http://example.com/abc/%02d' % i for i in range(0, 10)]
+    for url in urls01 + urls02:
+        pm.load(url)
+    clustered = dict([(m.url_meta, list(m.make())) for m in pm.makers])
+    assert not any([m.dirty for m in pm.makers])
+
+    urls03 = ['http://example.com/abc/%02d' % i for i in range(10, 20)]
+    for url in urls03:
+        pm.load(url)
+    assert len([m for m in pm.makers if m.dirty]) == 1
+
+    fresh = PatternMaker(config)
+    for url in urls01 + urls02 + urls03:
+        fresh.load(url)
+    expected = set([r for url_meta, c in fresh.make()
+                    for r in pformat('json', url_meta, c)])
+    assert set([r for url_meta, c in pm.make()
+                for r in pformat('json', url_meta, c)]) == expected
+
+    for m in pm.makers:
+        if m.url_meta.path_depth == 1:
+            assert list(m.make()) == clustered[m.url_meta]
+
+
+@pytest.mark.parametrize('max_urls', [0, 100])
+@pytest.mark.parametrize('max_examples', [0, 5])
+def test_incremental_reload(config, max_urls, max_examples):
+    config.set('make', 'max_urls_per_maker', str(max_urls))
+    config.set('make', 'max_examples', str(max_examples))
+    pm = PatternMaker(config, incremental=True)
+    urls = ['http://example.com/abc%02d.html' % i for i in range(0, 10)]
+    for url in urls:
+        pm.load(url, meta=url)
+    list(pm.make())
+
+    for url in urls:
+        pm.load(url, meta=url)
+        pm.load(url)
+    assert not any([m.dirty for m in pm.makers])
+
+    pm.load(urls[0], meta='new')
+    assert all([m.dirty for m in pm.makers])
+
+
+def test_save_restore(config):
+    pm = PatternMaker(config, incremental=True)
+    urls = ['http://example.com/abc%02d.html' % i for i in range(0, 10)]
+    for url in urls:
+        pm.load(url, meta=url)
+    expected = [r for url_meta, c in pm.make()
+                for r in pformat('cluster', url_meta, c)]
+
+    f = BytesIO()
+    pm.save(f)
+    f.seek(0)
+    restored = PatternMaker.restore(f, config)
+    assert not any([m.dirty for m in restored.makers])
+    assert sorted([r for url_meta, c in restored.make()
+                   for r in pformat('cluster', url_meta, c)]) == sorted(expected)
+
+    restored.load('http://example.com/abc10.html')
+    assert all([m.dirty for m in restored.makers])
+    for _, clustered in restored.make():
+        assert clustered.count == 11
+
+
+def test_save_restore_untouched(config):
+    pm = PatternMaker(config, incremental=True)
+    urls = ['http://example.com/abc%02d.html' % i for i in range(0, 10)]
+    urls.extend(['http://example.com/a/%02d' % i for i in range(0, 10)])
+    for url in urls:
+        pm.load(url, meta=url)
+    list(pm.make())
+    f = BytesIO()
+    pm.save(f)
+    f.seek(0)
+    state = pickle.loads(f.getvalue())
+    restored = PatternMaker.restore(f, config)
+    restored.load('http://example.com/a/10', meta='new')
+    f = BytesIO()
+    restored.save(f)
+    new_state = pickle.loads(f.getvalue())
+    changed = [sid for sid, s in new_state['makers']
+               if s != dict(state['makers'])[sid]]
+    assert len(changed) == 1
+
+    pm.load('http://example.com/a/10', meta='new')
+    f.seek(0)
+    restored = PatternMaker.restore(f, config)
+    assert sorted([r for url_meta, c in restored.make()
+                   for r in pformat('cluster', url_meta, c)]) == \
+        sorted([r for url_meta, c in pm.make()
+                for r in pformat('cluster', url_meta, c)])
+
+
+def test_sample(config):
+    from os_urlpattern.parser import parse
+    url_meta, _ = parse('http://example.com/abc/1')
+    maker = Maker(url_meta, config, max_urls=10)
+    for i in range(0, 1000):
+        _, parsed_pieces = parse('http://example.com/abc/%d' % i)
+        maker.load(parsed_pieces)
+    clustered = list(maker.make())
+    assert sum([c.count for c in clustered]) == 1000
+    assert sum([len(list(dump_tree(c))) for c in clustered]) == 10
+
+
+def test_stream(config):
+    pm = StreamPatternMaker(config, max_urls_per_maker=20,
+                            max_makers=2, emit_every=100)
+    urls = ['http://example.com/abc/%d' % i for i in range(0, 250)]
+    urls.extend(['http://example.com/abc%d.html' % i for i in range(0, 10)])
+    urls.append('http://example.com/abc/%d/' % 0)
+    emitted = list(pm.stream(urls))
+    assert len(emitted) == 3
+    for url_meta, clustered in emitted[0]:
+        assert clustered.count == 100
+        assert len(list(dump_tree(clustered))) == 20
+        for pattern in pformat('pattern', url_meta, clustered):
+            assert pattern == '/abc/[0-9]+'
+    assert len(list(pm.makers)) == 2
+
+
+def test_stream_bounded(config):
+    pm = StreamPatternMaker(config, max_urls_per_maker=100)
+    sizes = []
+    for n in range(0, 4):
+        for i in range(n * 2000, (n + 1) * 2000):
+            pm.load('http://example.com/item/%05d.html' % i)
+        maker = pick(pm.makers)
+        assert maker.size == 100
+        sizes.append(len(pickle.dumps(maker.get_state(), 2)))
+    assert max(sizes) < min(sizes) * 1.1
+
+    pm.load('http://example.com/item/00000.html')
+    assert maker.total == 8001
+
+
+def test_max_urls_per_maker(config):
+    config.set('make', 'max_urls_per_maker', '100')
+    pm = PatternMaker(config)
+    for i in range(0, 1000):
+        pm.load('http://example.com/abc/%03d' % i)
+    maker = pick(pm.makers)
+    assert maker.sampling
+    assert maker.total == 1000
+    for url_meta, clustered in pm.make():
+        assert len(list(dump_tree(clustered))) == 100
+        for o in pformat('json', url_meta, clustered):
+            assert json.loads(o)['cnt'] == 1000
+
+
+@pytest.mark.parametrize('max_urls', [0, 100, 200, 300])
+def test_max_urls_per_maker_duplicated(config, max_urls):
+    config.set('make', 'max_urls_per_maker', str(max_urls))
+    pm = PatternMaker(config)
+    for _ in range(0, 10):
+        for i in range(0, 200):
+            pm.load('http://example.com/abc/%03d' % i)
+    maker = pick(pm.makers)
+    assert maker.total == 200
+    for url_meta, clustered in pm.make():
+        for o in pformat('json', url_meta, clustered):
+            assert json.loads(o)['cnt'] == 200
+
+    f = BytesIO()
+    pm.save(f)
+    f.seek(0)
+    restored = PatternMaker.restore(f, config)
+    for i in range(0, 201):
+        restored.load('http://example.com/abc/%03d' % i)
+    assert pick(restored.makers).total == 201
+
+
+def test_load_weighted(config):
+    pm = PatternMaker(config)
+    for i in range(0, 10):
+        pm.load('http://example.com/abc%02d.html' % i, count=100, uniq=False)
+    pm.load('http://example.com/abc00.html', count=50, uniq=False)
+    for url_meta, clustered in pm.make():
+        assert clustered.count == 1050
+        for o in pformat('json', url_meta, clustered):
+            assert json.loads(o)['ptn'] == '/abc[0-9]{2}[\\.]html'
+
+
+def test_max_examples(config):
+    config.set('make', 'max_examples', '2')
+    pm = PatternMaker(config)
+    for i in range(0, 10):
+        for j in range(0, 5):
+            url = 'http://example.com/abc%02d.html' % i
+            pm.load(url, meta='%s#%d' % (url, j))
+    kept = 0
+    for url_meta, clustered in pm.make():
+        assert clustered.count == 10
+        for nodes in dump_tree(clustered):
+            meta = nodes[-1].meta
+            if meta is None:
+                continue
+            kept += 1
+            assert len(meta) == 2
+            assert meta.count == 5
+    assert kept == 2
+
+
+def test_max_examples_per_parrent(config):
+    config.set('make', 'max_examples', '3')
+    config.set('make', 'max_urls_per_maker', '100')
+    pm = PatternMaker(config)
+    for i in range(0, 1000):
+        pm.load('http://example.com/abc/%03d.html' % i, meta=i)
+    maker = pick(pm.makers)
+    assert maker.size == 100
+    for url_meta, clustered in pm.make():
+        assert sum([1 for nodes in dump_tree(clustered)
+                    if nodes[-1].meta is not None]) <= 3
+        assert len(list(pformat('inline', url_meta, clustered))) == 3
+
+    pm = PatternMaker(config)
+    for i in range(0, 100):
+        pm.load('http://example.com/abc/%03d.html?id=%d' % (i, i), meta=i)
+    for url_meta, clustered in pm.make():
+        assert clustered.count == 100
+        assert sum([1 for nodes in dump_tree(clustered)
+                    if nodes[-1].meta is not None]) == 9
+
+
+def test_stats(config):
+    pm = PatternMaker(config, collect_stats=True)
+    for i in range(0, 20):
+        pm.load('http://example.com/abc%02d/%d.html' % (i, i))
+        pm.load('http://example.com/abc%02d-%d.html' % (i, i))
+    list(pm.make())
+    stats = pm.stats().as_dict()
+    for name in ['PiecePatternCluster', 'BasePatternCluster',
+                 'LengthPatternCluster']:
+        assert stats['cluster'][name]['calls'] > 0
+    assert stats['cluster']['PiecePatternCluster']['objs'] > 0
+    assert set(['0', '1', '2']) <= set(stats['level'])
+    assert stats['process']['process']['calls'] >= 2
+    assert PatternMaker(config).stats() is None
+
+
+def test_cluster_budget(config):
+    config.set('make', 'max_cluster_visits', '5')
+    pm = PatternMaker(config, incremental=True)
+    for i in range(0, 10):
+        pm.load('http://example.com/abc%02d.html' % i)
+    for url_meta, clustered in pm.make():
+        assert clustered.truncated
+        assert clustered.count == 10
+        for o in pformat('json', url_meta, clustered):
+            d = json.loads(o)
+            assert d['ptn'] == '/[0-9\\.a-z]+'
+            assert d['trunc']
+
+    f = BytesIO()
+    pm.save(f)
+    f.seek(0)
+    pm = PatternMaker.restore(f, config)
+    assert pick(pick(pm.makers).make()).truncated
+
+    pm = PatternMaker(config)
+    for i in range(0, 10):
+        pm.load('http://example.com/u/%d#' % i)
+    for url_meta, clustered in pm.make():
+        assert clustered.truncated
+        assert list(pformat('pattern', url_meta, clustered)) == \
+            ['/[a-z]+/[0-9]+#']
+
+    config.set('make', 'max_cluster_visits', '0')
+    pm = PatternMaker(config)
+    for i in range(0, 10):
+        pm.load('http://example.com/abc%02d.html' % i)
+    for url_meta, clustered in pm.make():
+        assert not clustered.truncated
+        for o in pformat('json', url_meta, clustered):
+            assert 'trunc' not in json.loads(o)
+
+
+def test_cache(config, tmpdir):
+    cache_dir = tmpdir.join('cache').strpath
+    urls = ['http://example.com/abc%02d.html' % i for i in range(0, 10)]
+    urls.extend(['http://example.com/abc/%02d' % i for i in range(0, 10)])
+
+    def make(urls):
+        pm = PatternMaker(config, cache_dir=cache_dir)
+        for url in urls:
+            pm.load(url, meta=url)
+        results = set()
+        for url_meta, clustered in pm.make():
+            results.update(pformat('cluster', url_meta, clustered))
+        return pm.cache, results
+
+    cache, results = make(urls)
+    assert (cache.hits, cache.misses) == (0, 2)
+    cache, cached_results = make(reversed(urls))
+    assert (cache.hits, cache.misses) == (2, 0)
+    assert cached_results == results
+    cache, _ = make(urls + ['http://example.com/abc/10'])
+    assert (cache.hits, cache.misses) == (1, 1)
+
+    config.set('make', 'max_cluster_visits', '1')
+    cache_dir = tmpdir.join('truncated').strpath
+    cache, _ = make(urls)
+    assert (cache.hits, cache.misses) == (0, 2)
+    cache, _ = make(urls)
+    assert (cache.hits, cache.misses) == (0, 2)
+
+
+def test_merge(config):
+    urls = ['http://example.com/abc%02d.html' % i for i in range(0, 20)]
+    urls.extend(['http://example.com/abc/%02d' % i for i in range(0, 5)])
+
+    def make(pm):
+        return sorted(o for url_meta, clustered in pm.make()
+                      for o in pformat('json', url_meta, clustered))
+
+    expected = PatternMaker(config)
+    for url in urls:
+        expected.load(url, meta=url)
+
+    shards = [PatternMaker(config) for _ in range(0, 3)]
+    for i, url in enumerate(urls):
+        shards[i % 3].load(url, meta=url)
+    shards[0].load(urls[1], meta=urls[1])
+    f = BytesIO()
+    shards[2].save(f)
+    f.seek(0)
+
+    pm = PatternMaker(config)
+    pm.merge(shards[0], uniq=True)
+    pm.merge(shards[1], uniq=True)
+    pm.merge(PatternMaker.restore(f, config), uniq=True)
+    assert make(pm) == make(expected)
+    for maker in pm.makers:
+        for clustered in maker.make():
+            for nodes in dump_tree(clustered):
+                assert nodes[-1].meta
+    assert sum(maker.size for maker in pm.makers) == len(urls)
+
+    pm = PatternMaker(config)
+    pm.load(urls[1])
+    pm.merge(shards[1])
+    assert pick(pm.makers).size == 7
+    assert pick(pm.makers).total == 8
+
+
+def test_load_pattern(config):
+    pm = PatternMaker(config)
+    for pattern, count in [('/abc[0-9]{2}[\\.]html', 10),
+                           ('/abc[0-9]{2}[\\.]html', 5),
+                           ('/item/[0-9]{2}', 20),
+                           ('/item/[0-9]{3}', 20),
+                           ('/item/[0-9]+', 5)]:
+        pm.load_pattern(pattern, meta=pattern, count=count)
+    results = {}
+    for url_meta, clustered in pm.make():
+        for o in pformat('json', url_meta, clustered):
+            d = json.loads(o)
+            results[d['ptn']] = d['cnt']
+    assert results == {'/abc[0-9]{2}[\\.]html': 15, '/item/[0-9]+': 45}
+
+
+@pytest.mark.parametrize('max_urls', [0, 100])
+def test_absorb(config, max_urls):
+    config.set('make', 'max_urls_per_maker', str(max_urls))
+    pm = PatternMaker(config)
+    for pattern, count in [('/q/abc', 1),
+                           ('/q/def', 1),
+                           ('/q/[a-z]+', 100),
+                           ('/q/[a-z]{3}', 2),
+                           ('/q/[0-9]+', 3)]:
+        pm.load_pattern(pattern, meta=pattern, count=count)
+    assert pm.absorb() == 3
+    assert pm.absorb() == 0
+    results = {}
+    for url_meta, clustered in pm.make():
+        for nodes in dump_tree(clustered):
+            results[str(nodes[-1].pattern)] = (nodes[-1].count,
+                                               sorted(nodes[-1].meta))
+    assert results == {
+        '[a-z]+': (104, ['/q/[a-z]+', '/q/[a-z]{3}', '/q/abc', '/q/def']),
+        '[0-9]+': (3, ['/q/[0-9]+'])}
+
+
+def test_absorb_path(config):
+    pm = PatternMaker(config)
+    for pattern, count in [('/q/abc/x', 1),
+                           ('/q/[a-z]+/y', 10),
+                           ('/q/abc/y', 2),
+                           ('/q/def/[0-9]+', 1),
+                           ('/q/[a-z]+/[0-9]+', 5),
+                           ('/q/[a-z]{3}/7', 1),
+                           ('/q/abc[0-9]+/x', 1),
+                           ('/q/xyz[0-9]+/x', 1)]:
+        pm.load_pattern(pattern, count=count)
+    assert pm.absorb() == 3
+    results = {}
+    for url_meta, clustered in pm.make():
+        for o in pformat('json', url_meta, clustered):
+            d = json.loads(o)
+            results[d['ptn']] = d['cnt']
+    assert results == {'/q/abc/x': 1, '/q/[a-z]+/y': 12,
+                       '/q/[a-z]+/[0-9]+': 7, '/q/abc[0-9]+/x': 1,
+                       '/q/xyz[0-9]+/x': 1}
+
+
+def test_dedupe(config):
+    urls = ['http://example.com/abc%02d.html' % i for i in range(0, 10)]
+    pm = PatternMaker(config, dedupe=True)
+    for url in urls + urls:
+        pm.load(url, meta=url)
+    assert pm.duplicates == 10
+    for _ in range(0, 2):
+        with pytest.raises(InvalidCharException):
+            pm.load('http://example.com/a b')
+    pm.load(urls[0], count=10, uniq=False)
+    assert pm.duplicates == 10
+    for url_meta, clustered in pm.make():
+        for o in pformat('json', url_meta, clustered):
+            assert json.loads(o)['cnt'] == 20
+
+
+def test_dedupe_meta(config):
+    pm = PatternMaker(config, dedupe=True)
+    url = 'http://example.com/abc.html'
+    pm.load(url, meta=url)
+    assert pm.load(url, meta=url) == (None, False)
+    node, is_new = pm.load(url, meta='b')
+    assert not is_new
+    assert pm.load(url, meta='b') == (None, False)
+    node, is_new = pm.load(url)
+    assert not is_new
+    assert pm.load(url) == (None, False)
+    assert pm.duplicates == 3
+    assert sorted(node.meta) == sorted([url, 'b'])
+    for url_meta, clustered in pm.make():
+        assert clustered.count == 1
@@ -1,4 +1,4 @@
-from os_urlpattern.pattern_matcher import PatternMatcher
+from os_urlpattern.pattern_matcher import PatternMatcher, get_match_pattern
 
 
 def match(patterns, urls, num, most_match=None):
@@ -26,3 +26,20 @@ def test_match():
     for pattern in patterns:
         match([pattern], urls, 0)
     match(patterns, urls, 3, '/abc[0-9]{2}')
+
+
+def test_get_match_pattern():
+    p = get_match_pattern('[0-9]+')
+    assert get_match_pattern('[0-9]+') is p
+    assert get_match_pattern('[0-9]+', True) is not p
+
+
+def test_sort_key():
+    pm = PatternMatcher()
+    for pattern in ['/abc[0-9]+', '/abc[0-9]{2}', '/[a-z]+[0-9]{2}']:
+        pm.load(pattern, meta=pattern)
+    matched = pm.match('http://example.com/abc01')
+    assert [n.meta for n in sorted(matched, reverse=True)] == \
+        [n.meta for n in sorted(matched, key=lambda n: n.sort_key,
+                                reverse=True)]
+    assert max(matched).meta == '/abc[0-9]{2}'
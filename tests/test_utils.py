@@ -0,0 +1,123 @@
+import bz2
+import gzip
+import sys
+from io import BytesIO
+
+import pytest
+
+from os_urlpattern.utils import (FingerprintSet, OutputBuffer, TreeNode,
+                                 build_tree, dump_tree, iter_leaves,
+                                 iter_lines, iter_preorder, lzma)
+
+
+def _gzip(data):
+    f = BytesIO()
+    with gzip.GzipFile(fileobj=f, mode='wb') as g:
+        g.write(data)
+    return f.getvalue()
+
+
+def _compressors():
+    compressors = [lambda data: data, _gzip, bz2.compress]
+    if lzma is not None:
+        compressors.append(lzma.compress)
+    return compressors
+
+
+@pytest.mark.parametrize('chunk_size', [1, 7, 1 << 20])
+@pytest.mark.parametrize('compress', _compressors())
+def test_iter_lines(compress, chunk_size):
+    lines = [('http://example.com/abc%03d' % i).encode() for i in range(100)]
+    data = b'\n'.join(lines)
+    fileobjs = [BytesIO(compress(data + b'\n')), BytesIO(compress(data))]
+    assert list(iter_lines(fileobjs, chunk_size)) == lines + lines
+
+
+@pytest.mark.parametrize('chunk_size', [1, 3, 7, 1 << 20])
+@pytest.mark.parametrize('compress', _compressors()[1:])
+def test_iter_lines_multi_member(compress, chunk_size):
+    data = b''.join([compress(b'a\n'), compress(b'b\n'),
+                     compress(b'c\nd'), compress(b'd\n')])
+    assert list(iter_lines([BytesIO(data)], chunk_size)) == \
+        [b'a', b'b', b'c', b'dd']
+
+
+@pytest.mark.parametrize('chunk_size', [1, 7, 1 << 20])
+@pytest.mark.parametrize('compress', _compressors()[1:])
+def test_iter_lines_trailing(compress, chunk_size, caplog):
+    data = compress(b'a\nb\n') + b'\0' * 512
+    assert list(iter_lines([BytesIO(data)], chunk_size)) == [b'a', b'b']
+    data = compress(b'a\n') + b'\0' * 10 + compress(b'b\n') + b'\0' * 3
+    assert list(iter_lines([BytesIO(data)], chunk_size)) == [b'a', b'b']
+    assert not caplog.records
+
+    data = compress(b'a\nb\n') + b'garbage\n'
+    assert list(iter_lines([BytesIO(data)], chunk_size)) == [b'a', b'b']
+    assert 'trailing garbage' in caplog.text
+
+
+def test_iter_lines_empty():
+    assert list(iter_lines([BytesIO(b'')])) == []
+    assert list(iter_lines([BytesIO(b'\n\n')])) == [b'', b'']
+
+
+def test_output_buffer():
+    f = BytesIO()
+    with OutputBuffer(f, buffer_size=8) as output:
+        output.write_line(b'abc')
+        assert f.getvalue() == b''
+        output.write(b'abcd')
+        assert f.getvalue() == b'abc\nabcd'
+        output.write_line(b'abc')
+    assert f.getvalue() == b'abc\nabcdabc\n'
+
+
+def test_fingerprint_set():
+    fps = FingerprintSet(4)
+    urls = ['http://example.com/abc%03d' % i for i in range(1000)]
+    for url in urls:
+        assert fps.add(FingerprintSet.fingerprint(url))
+    assert len(fps) == 1000
+    for url in urls:
+        fp = FingerprintSet.fingerprint(url)
+        assert fp in fps
+        assert not fps.add(fp)
+    assert FingerprintSet.fingerprint('http://example.com/abc') not in fps
+    assert len(fps) == 1000
+
+
+def test_tree_walkers():
+    root = TreeNode('')
+    for path in ['abc', 'abd', 'ae', 'b']:
+        build_tree(root, [(c, c) for c in path])
+    assert [''.join([n.value for n in nodes])
+            for nodes in dump_tree(root)] == ['abc', 'abd', 'ae', 'b']
+    assert [n.value for n in iter_leaves(root)] == ['c', 'd', 'e', 'b']
+    assert ''.join([n.value for n in iter_preorder(root)]) == 'abcdeb'
+
+    root = TreeNode('')
+    assert [list(nodes) for nodes in dump_tree(root)] == [[root]]
+    assert list(iter_leaves(root)) == [root]
+
+    depth = sys.getrecursionlimit() * 2
+    build_tree(root, [(i, i) for i in range(depth)])
+    assert len(next(dump_tree(root))) == depth + 1
+    assert len(list(iter_preorder(root))) == depth + 1
+
+
+def test_tree_node_children():
+    root = TreeNode('')
+    assert root.leaf() and root.children_num == 0
+    a, is_new = root.add_child(('a', 'a'))
+    assert is_new and root.get_child('a') is a and root.get_child('b') is None
+    assert root.add_child(('a', 'a')) == (a, False)
+    b, _ = root.add_child(('b', 'b'))
+    c = TreeNode('c')
+    root.attach_child('c', c)
+    assert c.parrent is root
+    assert list(root.children) == [a, b, c] and root.children_num == 3
+    assert root.remove_child('a') is a and a.parrent is None
+    assert root.remove_child('a') is None
+    root.remove_child('b')
+    root.remove_child('c')
+    assert root.leaf() and list(root.children) == []